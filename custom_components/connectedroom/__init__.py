@@ -2,12 +2,18 @@
 from __future__ import annotations
 
 import logging
+import time
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
 
 from .const import DOMAIN
 from .coordinator import ConnectedRoomCoordinator
+from .coordinator import STORAGE_VERSION
+from .outbound import STORAGE_VERSION as OUTBOUND_STORAGE_VERSION
+from .runtime_config import RuntimeConfig
+from .services import async_setup_services
 
 
 LOGGER = logging.getLogger(__name__)
@@ -17,16 +23,37 @@ PLATFORMS: list[str] = ["sensor"]
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up WLED from a config entry."""
-    coordinator = ConnectedRoomCoordinator(hass, entry=entry)
-    await coordinator.async_config_entry_first_refresh()
+    started = time.monotonic()
+
+    # Entries created when only one was allowed have no unique id yet
+    if entry.unique_id is None:
+        hass.config_entries.async_update_entry(entry, unique_id=entry.data["unique_id"])
+
+    # Restore the game state before anything is connected
+    store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}.game")
+    restored = await store.async_load()
+
+    coordinator = ConnectedRoomCoordinator(
+        hass, entry=entry, store=store, restored=restored
+    )
 
     hass.data.setdefault(DOMAIN, {})[entry.entry_id] = coordinator
 
+    await async_setup_services(hass)
+
     # Set up all platforms for this device/entry.
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
-    # Reload entry when its updated.
-    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+    # The connection and the device sync continue in the background, the
+    # sensor becomes available once they are done.
+    coordinator.async_start()
+
+    coordinator.connectedroom.metrics.set(
+        "startup.setup_entry_seconds", time.monotonic() - started
+    )
+
+    # Apply option changes without tearing the connection down.
+    entry.async_on_unload(entry.add_update_listener(async_update_options))
 
     return True
 
@@ -39,11 +66,44 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         # Ensure disconnected and cleanup stop sub
         coordinator.stop()
 
+        # Keep the requests that are still waiting to be sent
+        await coordinator.connectedroom.outbound.async_stop()
+
         del hass.data[DOMAIN][entry.entry_id]
 
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored game state and requests of a deleted entry."""
+    await Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}.game").async_remove()
+    await Store(
+        hass, OUTBOUND_STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}.outbound"
+    ).async_remove()
+
+
+async def async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Apply the updated options to the running entry."""
+    coordinator: ConnectedRoomCoordinator = hass.data[DOMAIN][entry.entry_id]
+    connectedroom = coordinator.connectedroom
+
+    # A new API key needs a new login and connection
+    if entry.data["api_key"] != coordinator.api_key:
+        await async_reload_entry(hass, entry)
+        return
+
+    previous = connectedroom.config
+    config = RuntimeConfig.from_options(entry.options)
+
+    connectedroom.update_config(config)
+
+    # Binds and syncs the devices when the selection changed
+    if config.device_target != previous.device_target:
+        connectedroom.devices.async_set_target(config.device_target)
+
+    coordinator.async_update_listeners()
+
+
 async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Reload the config entry when it changed."""
     await hass.config_entries.async_reload(entry.entry_id)
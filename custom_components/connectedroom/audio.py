@@ -0,0 +1,57 @@
+"""Length of the goal horn audio files."""
+from __future__ import annotations
+
+import io
+import logging
+
+import httpx
+
+_LOGGER = logging.getLogger(__name__)
+
+MAX_AUDIO_SIZE = 10 * 1024 * 1024
+PROBE_TIMEOUT = 5
+
+
+def probe_duration(url: str) -> float | None:
+    """Download an audio file and return its length in seconds, blocking.
+
+    mutagen comes with the Home Assistant TTS integration, without it the
+    length is unknown and None is returned.
+    """
+    try:
+        import mutagen  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+
+    if not url.startswith(("http://", "https://")):
+        return None
+
+    buffer = io.BytesIO()
+
+    try:
+        with httpx.stream(
+            "GET", url, timeout=PROBE_TIMEOUT, verify=False, follow_redirects=True
+        ) as response:
+            response.raise_for_status()
+
+            for chunk in response.iter_bytes():
+                buffer.write(chunk)
+
+                if buffer.tell() > MAX_AUDIO_SIZE:
+                    return None
+    except Exception:  # pylint: disable=broad-except
+        _LOGGER.debug("Unable to download %s", url, exc_info=True)
+        return None
+
+    buffer.seek(0)
+
+    try:
+        audio = mutagen.File(buffer)
+    except Exception:  # pylint: disable=broad-except
+        _LOGGER.debug("Unable to read the length of %s", url, exc_info=True)
+        return None
+
+    if audio is None or audio.info is None or not audio.info.length:
+        return None
+
+    return float(audio.info.length)
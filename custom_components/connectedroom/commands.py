@@ -0,0 +1,151 @@
+"""Translation of the ConnectedRoom device commands to service calls."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from homeassistant.core import callback
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+from homeassistant.util import color as color_util
+
+# The cloud sends colours as xy, the first mode an entity supports is used
+COLOR_MODES = ("xy", "hs", "rgb", "rgbw", "rgbww", "color_temp")
+BRIGHTNESS_MODES = (*COLOR_MODES, "brightness", "white")
+
+
+@dataclass(frozen=True, slots=True)
+class EntityCommands:
+    """How the commands of an entity are sent, in its native domain and mode."""
+
+    domain: str
+    color_mode: str | None
+    brightness: bool
+    effects: bool
+
+    def translate(self, data: dict) -> tuple[str, str, dict] | None:
+        """Return the (domain, service, service_data) call for a command."""
+        action = data["action"]
+
+        if action in ("turn_on", "turn_off"):
+            return self.domain, action, {}
+
+        if self.domain != "light":
+            # Switches are only on or off
+            if action == "set_brightness":
+                return self.domain, _on_off(data["brightness"]), {}
+
+            if action == "restore":
+                state = data.get("state") or {}
+
+                return self.domain, _on_off(state.get("state", "on") != "off"), {}
+
+            if action == "set_color":
+                return self.domain, "turn_on", {}
+
+            return None
+
+        if action == "set_color":
+            return "light", "turn_on", self.color_data(data["color"])
+
+        if action == "set_brightness":
+            if not self.brightness:
+                return "light", _on_off(data["brightness"]), {}
+
+            return "light", "turn_on", {"brightness": data["brightness"]}
+
+        if action == "set_effect":
+            return (
+                ("light", "turn_on", {"effect": data["effect"]})
+                if self.effects
+                else None
+            )
+
+        if action == "restore":
+            return "light", "turn_on", dict(data["state"])
+
+        return None
+
+    def color_data(self, color) -> dict:
+        x, y = float(color[0]), float(color[1])
+
+        if self.color_mode == "xy":
+            return {"xy_color": [x, y]}
+
+        if self.color_mode == "hs":
+            return {"hs_color": list(color_util.color_xy_to_hs(x, y))}
+
+        if self.color_mode in ("rgb", "rgbw", "rgbww"):
+            return {"rgb_color": list(color_util.color_xy_to_RGB(x, y))}
+
+        # White only lights just turn on
+        return {}
+
+
+def _on_off(value) -> str:
+    return "turn_on" if value else "turn_off"
+
+
+@callback
+def entity_commands(hass: HomeAssistant, entity_id: str) -> EntityCommands | None:
+    """Compute the commands of an entity, None while its modes are unknown."""
+    domain = entity_id.split(".", 1)[0]
+
+    if domain != "light":
+        return EntityCommands(domain, None, False, False)
+
+    entry = er.async_get(hass).async_get(entity_id)
+    capabilities = (entry.capabilities if entry is not None else None) or {}
+    state = hass.states.get(entity_id)
+
+    if "supported_color_modes" not in capabilities and state is not None:
+        capabilities = state.attributes
+
+    modes = capabilities.get("supported_color_modes")
+
+    if modes is None:
+        return None
+
+    return EntityCommands(
+        domain="light",
+        color_mode=next((mode for mode in COLOR_MODES if mode in modes), None),
+        brightness=any(mode in BRIGHTNESS_MODES for mode in modes),
+        effects=bool(capabilities.get("effect_list")),
+    )
+
+
+class CommandTable:
+    """Commands of the selected entities, computed once per selection."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.hass = hass
+        self._table: dict[str, EntityCommands] = {}
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    @callback
+    def async_build(self, entity_ids) -> None:
+        table = {}
+
+        for entity_id in entity_ids:
+            commands = entity_commands(self.hass, entity_id)
+
+            # Not loaded yet, computed on its first command instead
+            if commands is not None:
+                table[entity_id] = commands
+
+        self._table = table
+
+    def get(self, entity_id: str) -> EntityCommands:
+        commands = self._table.get(entity_id)
+
+        if commands is None:
+            commands = entity_commands(self.hass, entity_id)
+
+            if commands is None:
+                # Unknown modes, HA converts the colour for us
+                return EntityCommands("light", "xy", True, True)
+
+            self._table = {**self._table, entity_id: commands}
+
+        return commands
@@ -11,8 +11,14 @@ from homeassistant.config_entries import OptionsFlow
 from homeassistant.core import callback
 from homeassistant.core import HomeAssistant
 from homeassistant.data_entry_flow import FlowResult
+from homeassistant.helpers.selector import BooleanSelector
 from homeassistant.helpers.selector import EntitySelector
 from homeassistant.helpers.selector import EntitySelectorConfig
+from homeassistant.helpers.selector import NumberSelector
+from homeassistant.helpers.selector import NumberSelectorConfig
+from homeassistant.helpers.selector import NumberSelectorMode
+from homeassistant.helpers.selector import SelectSelector
+from homeassistant.helpers.selector import SelectSelectorConfig
 from homeassistant.helpers.selector import TargetSelector
 from homeassistant.helpers.selector import TargetSelectorConfig
 from homeassistant.helpers.selector import TextSelector
@@ -21,6 +27,9 @@ from .connectedroom import CannotConnect
 from .connectedroom import ConnectedRoom
 from .connectedroom import InvalidAuth
 from .const import DOMAIN
+from .const import EVENT_PAYLOAD_FIELDS
+from .const import MAX_BROADCAST_DELAY
+from .executor import get_executor
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -43,7 +52,7 @@ async def validate_api_key(hass: HomeAssistant, data: dict) -> dict[str, Any]:
     Data has the keys from DATA_SCHEMA with values provided by the user.
     """
 
-    login = await hass.async_add_executor_job(
+    login = await get_executor(hass).async_run(
         ConnectedRoom.login_request, hass, data["api_key"]
     )
 
@@ -61,9 +70,6 @@ class ConfigFlow(ConfigFlow, domain=DOMAIN):
     ) -> FlowResult:
         """Handle the initial step."""
 
-        if self._async_current_entries():
-            return self.async_abort(reason="single_instance_allowed")
-
         schema = vol.Schema({vol.Required("api_key"): str})
 
         if user_input is None:
@@ -81,6 +87,10 @@ class ConfigFlow(ConfigFlow, domain=DOMAIN):
             _LOGGER.exception("Unexpected exception")
             errors["base"] = "unknown"
         else:
+            # One entry per ConnectedRoom account, they share the connection
+            await self.async_set_unique_id(info["unique_id"])
+            self._abort_if_unique_id_configured()
+
             self.user_info = info
 
             return await self.async_step_devices()
@@ -149,7 +159,14 @@ class OptionsFlowHandler(OptionsFlow):
         """Manage the options."""
         return self.async_show_menu(
             step_id="init",
-            menu_options=["user", "devices", "tts", "goal_horn"],
+            menu_options=[
+                "user",
+                "devices",
+                "tts",
+                "goal_horn",
+                "broadcast_delay",
+                "events",
+            ],
             description_placeholders={
                 "model": "Example model",
             },
@@ -262,6 +279,8 @@ class OptionsFlowHandler(OptionsFlow):
                 user_input["tts_service"] = None
             if "tts_devices" not in user_input:
                 user_input["tts_devices"] = None
+            if "tts_single_synthesis" not in user_input:
+                user_input["tts_single_synthesis"] = False
 
             # update options flow values
             self.options.update(user_input)
@@ -297,6 +316,12 @@ class OptionsFlowHandler(OptionsFlow):
                 ): EntitySelector(
                     EntitySelectorConfig(domain="media_player", multiple=True)
                 ),
+                vol.Optional(
+                    "tts_single_synthesis",
+                    default=self.config_entry.options.get(
+                        "tts_single_synthesis", False
+                    ),
+                ): BooleanSelector(),
             }
         )
 
@@ -312,6 +337,8 @@ class OptionsFlowHandler(OptionsFlow):
         if user_input is not None:
             if "goal_horn_devices" not in user_input:
                 user_input["goal_horn_devices"] = None
+            if "speaker_warm_up" not in user_input:
+                user_input["speaker_warm_up"] = False
 
             # update options flow values
             self.options.update(user_input)
@@ -330,7 +357,11 @@ class OptionsFlowHandler(OptionsFlow):
                     },
                 ): EntitySelector(
                     EntitySelectorConfig(domain="media_player", multiple=True)
-                )
+                ),
+                vol.Optional(
+                    "speaker_warm_up",
+                    default=self.config_entry.options.get("speaker_warm_up", False),
+                ): BooleanSelector(),
             }
         )
 
@@ -338,5 +369,87 @@ class OptionsFlowHandler(OptionsFlow):
             step_id="goal_horn", data_schema=schema, errors=errors
         )
 
+    async def async_step_broadcast_delay(
+        self, user_input: dict[str, Any | None] | None = None
+    ) -> FlowResult:
+        """Manage the options."""
+
+        errors = {}
+
+        if user_input is not None:
+            if "broadcast_delay" not in user_input:
+                user_input["broadcast_delay"] = 0
+
+            # update options flow values
+            self.options.update(user_input)
+            return await self._update_options()
+
+        schema = vol.Schema(
+            {
+                vol.Optional(
+                    "broadcast_delay",
+                    description={
+                        "suggested_value": self.config_entry.options.get(
+                            "broadcast_delay", 0
+                        )
+                    },
+                ): NumberSelector(
+                    NumberSelectorConfig(
+                        min=0,
+                        max=MAX_BROADCAST_DELAY,
+                        step=0.1,
+                        unit_of_measurement="s",
+                        mode=NumberSelectorMode.BOX,
+                    )
+                )
+            }
+        )
+
+        return self.async_show_form(
+            step_id="broadcast_delay", data_schema=schema, errors=errors
+        )
+
+    async def async_step_events(
+        self, user_input: dict[str, Any | None] | None = None
+    ) -> FlowResult:
+        """Manage the options."""
+
+        errors = {}
+
+        if user_input is not None:
+            if "single_event" not in user_input:
+                user_input["single_event"] = False
+            if "event_payload_fields" not in user_input:
+                user_input["event_payload_fields"] = []
+
+            # update options flow values
+            self.options.update(user_input)
+            return await self._update_options()
+
+        schema = vol.Schema(
+            {
+                vol.Optional(
+                    "single_event",
+                    default=self.config_entry.options.get("single_event", False),
+                ): BooleanSelector(),
+                vol.Optional(
+                    "event_payload_fields",
+                    description={
+                        "suggested_value": self.config_entry.options.get(
+                            "event_payload_fields", []
+                        )
+                    },
+                ): SelectSelector(
+                    SelectSelectorConfig(
+                        options=EVENT_PAYLOAD_FIELDS,
+                        multiple=True,
+                        custom_value=True,
+                    )
+                ),
+            }
+        )
+
+        return self.async_show_form(step_id="events", data_schema=schema, errors=errors)
+
     async def _update_options(self):
         return self.async_create_entry(title="ConnectedRoom", data=self.options)
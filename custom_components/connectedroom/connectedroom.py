@@ -1,23 +1,76 @@
 import asyncio
 import json
 import logging
-from threading import Timer
+import threading
+import time
+import tracemalloc
 
 import httpx
-import pysher
+from homeassistant.const import STATE_UNAVAILABLE
+from homeassistant.const import STATE_UNKNOWN
+from homeassistant.core import callback
 from homeassistant.core import HomeAssistant
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers import device_registry as dr
 from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers import event
+from homeassistant.util.async_ import run_callback_threadsafe
 
+from .audio import probe_duration
+from .commands import CommandTable
 from .const import API_URL
+from .const import BROADCAST_DELAY_TAG
+from .const import CATCH_UP_FRESHNESS
+from .const import DEVICES_SYNC_CHUNK_BYTES
+from .const import DEVICES_SYNC_PATH
+from .const import EVENT_CLASS_CELEBRATION
+from .const import EVENT_CLASS_EXECUTE
+from .const import EVENT_CLASS_GAME
+from .const import EVENT_CLASS_STATE
+from .const import EVENT_CONNECTEDROOM
+from .const import GOAL_HORN_TAG
+from .const import GOAL_HORN_TTS_GAP
+from .const import MAX_CATCH_UP_AGE
+from .const import MAX_CATCH_UP_EVENTS
+from .const import MISSED_EVENTS_PATH
+from .const import STATE_REPLY_PATH
+from .const import TTS_SKEW_WINDOW
+from .const import TTS_SYNTHESIS_TIMEOUT
+from .const import TTS_TAG
 from .const import VERSION
-from .const import WSS_HOST
-from .const import WSS_KEY
+from .event_queue import PriorityEventQueue
+from .executor import ExecutorFull
+from .executor import get_executor
+from .game import event_timestamp
+from .hub import get_hub
+from .metrics import MetricsRegistry
+from .outbound import OutboundQueue
+from .runtime_config import LIGHT_COLORS
+from .runtime_config import RuntimeConfig
+from .scheduler import DeadlineScheduler
+from .subscriptions import SubscriptionManager
+from .targets import resolve_target
+from .targets import TargetIndex
+from .tracing import current_context
+from .tracing import get_tracer
+from .tracing import start_trace
+from .tracing import trace_event
+from .tracing import TRACE_FILTER
+from .tracing import trace_span
+from .warmup import SpeakerWarmUp
 
 
 _LOGGER = logging.getLogger(__name__)
+_LOGGER.addFilter(TRACE_FILTER)
+
+LIGHT_COLOR_ATTRIBUTES = {
+    "color_temp": "color_temp_kelvin",
+    "hs": "hs_color",
+    "rgb": "rgb_color",
+    "rgbw": "rgbw_color",
+    "rgbww": "rgbww_color",
+    "xy": "xy_color",
+}
 
 
 class ConnectedRoom:
@@ -31,7 +84,6 @@ class ConnectedRoom:
         self.auth = None
         self.last_goal_horn_unsub = None
         self.tts_after_goal_horn = None
-        self.goal_horn_timer = None
         self.stay_on_goal_horn = False
         self.pusher = None
         self.reconnect_timer = None
@@ -39,6 +91,37 @@ class ConnectedRoom:
         self.do_not_reconnect = False
         self.reconnect_attempts = 0
         self.is_playing_horn = False
+        self.light_snapshot = {}
+        # Lights restored from the snapshot since the last goal
+        self.restored_lights = set()
+        self.goal_horn_durations = {}
+        self._goal_horn_probes = set()
+        # Ends of the measurements still following the players
+        self._measurements = set()
+        # Celebration scene entities by team, compiled at game_start
+        self.team_scenes = {}
+        self.config = RuntimeConfig.from_options(coordinator.config_entry.options)
+        self.broadcast_delay = self.config.broadcast_delay
+        self.scheduler = DeadlineScheduler(on_run=self.on_scheduled_run)
+        self.metrics = MetricsRegistry()
+        self.tracer = get_tracer(hass)
+        self.event_queue = PriorityEventQueue(
+            self.run_handler, on_drop=self.on_event_dropped
+        )
+        self.hub = get_hub(hass)
+        self.executor = get_executor(hass)
+        self.subscriptions = SubscriptionManager(self)
+        self.outbound = OutboundQueue(
+            hass, coordinator.config_entry.entry_id, self.send_queued
+        )
+        self.events = None
+        self.device_events = None
+        self.catch_up_lock = threading.Lock()
+        self.devices = TargetIndex(
+            hass, self.config.device_target, self.on_devices_changed
+        )
+        self.commands = CommandTable(hass)
+        self.warm_up = SpeakerWarmUp(self)
 
     def login_request(hass, api_key):
         headers = {"Authorization": "Bearer " + api_key, "Accept": "application/json"}
@@ -58,10 +141,14 @@ class ConnectedRoom:
         except Exception:
             raise ConnectionError
 
+        # An outage is no reason to give up on the API key
+        if request.status_code >= 500:
+            raise ConnectionError
+
         try:
             json_data = request.json()
         except Exception:
-            raise InvalidAuth
+            raise ConnectionError
 
         if not json_data["success"]:
             raise InvalidAuth
@@ -76,19 +163,96 @@ class ConnectedRoom:
     async def login(self, api_key):
         self.auth = None
 
-        self.auth = await self.hass.async_add_executor_job(
+        self.metrics.inc("api.login")
+
+        self.auth = await self.executor.async_run(
             ConnectedRoom.login_request, self.hass, api_key
         )
 
     def stop(self):
         self.do_not_reconnect = True
 
-        if (
-            self.pusher
-            and self.pusher.connection
-            and self.pusher.connection.state != "disconnected"
+        self.scheduler.stop()
+        self.event_queue.stop()
+        self.hass.loop.call_soon_threadsafe(self._async_stop_measurements)
+
+        if self.pusher is not None:
+            self.subscriptions.teardown()
+            self.hub.release(self)
+            self.pusher = None
+
+    def run_handler(self, handler, *args):
+        name = handler.__name__
+        # Allocations are only measured while tracemalloc is already tracing,
+        # e.g. during a profiling session
+        tracing = tracemalloc.is_tracing()
+        allocated = tracemalloc.get_traced_memory()[0] if tracing else 0
+        start = time.monotonic()
+
+        self.metrics.inc("events." + name)
+
+        try:
+            with trace_span("handler." + name):
+                asyncio.run(handler(*args))
+        except Exception:
+            self.metrics.inc("events.errors")
+            raise
+        finally:
+            self.metrics.observe("handler_duration." + name, time.monotonic() - start)
+
+            if tracing and tracemalloc.is_tracing():
+                self.metrics.observe(
+                    "handler_allocated_bytes." + name,
+                    tracemalloc.get_traced_memory()[0] - allocated,
+                )
+
+    def enqueue(self, event_class, handler, *args):
+        """Queue a received event for its handler, in a new trace."""
+        with start_trace(self.tracer, handler.__name__, event_class=event_class):
+            self.event_queue.put(event_class, handler, *args)
+
+    def dispatch(self, handler, data, event_class=EVENT_CLASS_GAME):
+        if self.broadcast_delay <= 0:
+            self.enqueue(event_class, handler, data)
+            return
+
+        with start_trace(
+            self.tracer,
+            handler.__name__,
+            event_class=event_class,
+            broadcast_delay=self.broadcast_delay,
         ):
-            self.pusher.disconnect()
+            # Queued once due, its max age counts from the end of the delay
+            self.scheduler.schedule(
+                self.broadcast_delay,
+                lambda: self.event_queue.put(event_class, handler, data),
+                tag=BROADCAST_DELAY_TAG,
+            )
+
+        self.metrics.set("broadcast_delay.pending", self.scheduler.pending())
+
+    def set_broadcast_delay(self, delay: float):
+        self.broadcast_delay = max(float(delay), 0.0)
+
+    def cancel_delayed_events(self):
+        self.scheduler.cancel(TTS_TAG)
+
+        self.tts_after_goal_horn = None
+
+        return self.scheduler.cancel(BROADCAST_DELAY_TAG)
+
+    def on_event_dropped(self, event_class):
+        self.metrics.inc("event_queue.dropped." + event_class)
+
+    def on_scheduled_run(self, tag, lateness):
+        # The warm-up and TTS timers are not broadcast delays
+        if tag != BROADCAST_DELAY_TAG:
+            return
+
+        self.metrics.observe("broadcast_delay.lateness", lateness)
+        self.metrics.set("broadcast_delay.pending", self.scheduler.pending())
+
+        self.coordinator.schedule_update()
 
     # init connectedroom
     async def setup(
@@ -100,6 +264,13 @@ class ConnectedRoom:
 
         await self.setup_websockets()
 
+        # Restarted during a game
+        if self.config.speaker_warm_up and self.coordinator.game.status in (
+            "in_progress",
+            "intermission",
+        ):
+            self.warm_up.start()
+
         await self.setup_devices()
 
     async def setup_websockets(self):
@@ -114,125 +285,406 @@ class ConnectedRoom:
 
         self.do_not_reconnect = False
 
-        self.pusher = pysher.Pusher(
-            key=WSS_KEY,
-            custom_host=WSS_HOST,
-            auth_endpoint=API_URL + "/auth/websockets",
-            auth_endpoint_headers={"x-websocket-key": self.auth["websocket_key"]},
-            reconnect_interval=15,
-            log_level=logging.CRITICAL,
+        # Every entry shares the connection of the hub
+        self.pusher = self.hub.acquire(self)
+
+        # Channels and bindings are created once, every connection only
+        # subscribes them again
+        self.events = ConnectedRoomEvents(self, self.auth["unique_id"])
+        self.device_events = ConnectedRoomDeviceEvents(
+            self, self.auth["integration_key"]
         )
 
-        def connect_handler(data):
-            ConnectedRoomEvents(self, self.pusher, self.auth["unique_id"])
-            ConnectedRoomDeviceEvents(self, self.pusher, self.auth["integration_key"])
+        # Catch up once there is something to replay the events to
+        self.hub.ready(self)
 
-        def error_handler(data):
-            if "code" in data:
-                try:
-                    error_code = int(data["code"])
-                except ValueError:
-                    error_code = None
+        return self.pusher
 
-                if error_code is not None:
-                    self.pusher.connection.logger.error(
-                        "Connection: Received error %s" % error_code
-                    )
+    def on_connected(self):
+        """Called by the hub from the pusher thread once connected."""
+        self.metrics.inc("connection.established")
 
-                    if (error_code >= 4200) and (error_code <= 4299):
-                        # The connection SHOULD be re-established immediately
-                        self.pusher.connection.reconnect(5)
-                    else:
-                        self.pusher.connection.reconnect()
-                else:
-                    self.pusher.connection.logger.error(
-                        "Connection: Unknown error code"
-                    )
-            else:
-                self.pusher.connection.logger.error(
-                    "Connection: No error code supplied"
-                )
+        # Deliver what could not be sent while offline
+        self.hass.add_job(self.outbound.async_flush, True)
 
-        self.pusher.connection.ping_interval = 15
+        # And replay what was published meanwhile
+        try:
+            self.executor.submit(self.catch_up)
+        except ExecutorFull:
+            self.metrics.inc("catch_up.rejected")
 
-        self.pusher.connection.bind("pusher:connection_established", connect_handler)
+    def catch_up(self):
+        """Replay the events missed while disconnected, blocking."""
+        since = self.coordinator.last_event_at
 
-        self.pusher.connection.event_callbacks.pop("pusher:error")
+        if since is None or self.auth is None or self.events is None:
+            return
 
-        self.pusher.connection.bind("pusher:error", error_handler)
+        if not self.catch_up_lock.acquire(blocking=False):
+            return
 
-        self.pusher.connect()
+        try:
+            since = max(since, time.time() - MAX_CATCH_UP_AGE)
 
-        return self.pusher
+            try:
+                missed = ConnectedRoom.missed_events_request(
+                    self.auth["api_key"], since, MAX_CATCH_UP_EVENTS
+                )
+            except ConnectionError:
+                self.metrics.inc("api.errors")
+                return
+
+            for event_name, data, timestamp in missed_events(missed):
+                self.events.replay(
+                    event_name,
+                    data,
+                    fresh=time.time() - (timestamp or since) <= CATCH_UP_FRESHNESS,
+                )
+        finally:
+            self.catch_up_lock.release()
 
-    async def setup_devices(self):
-        devices = self.coordinator.config_entry.options.get("devices")
+    @callback
+    def on_devices_changed(self, added, removed):
+        if self.device_events is not None:
+            self.device_events.bind_devices()
 
-        if devices is None:
+        # Synced by setup once logged in
+        if self.auth is None:
             return
 
-        entity_registry = er.async_get(self.hass)
-        device_registry = dr.async_get(self.hass)
-
-        to_sync = []
+        # The devices sync replaces the whole list of the integration on the
+        # cloud, there is no request to add or remove a few devices. The
+        # selection is sent again in full, the debounce of TargetIndex
+        # already folds bursts of registry updates into one sync.
+        self.coordinator.config_entry.async_create_background_task(
+            self.hass, self.setup_devices(), "connectedroom-sync-devices"
+        )
 
-        for entity_id in devices["entity_id"]:
-            entity = entity_registry.async_get(entity_id)
+    async def setup_devices(self):
+        if not self.devices.entity_ids:
+            return
 
-            device = device_registry.async_get(entity.device_id)
+        to_sync = device_sync_entries(self.hass, self.devices.entity_ids)
 
-            name = entity.original_name
+        payload = {
+            "devices": to_sync,
+        }
 
-            if name is None:
-                name = device.name
+        self.metrics.inc("api.devices_sync")
+        self.metrics.set("devices.synced", len(to_sync))
+        self.metrics.set("devices.skipped", len(self.devices.entity_ids) - len(to_sync))
 
-            to_sync.append(
-                {
-                    "entity_id": entity.entity_id,
-                    "capabilities": entity.capabilities,
-                    "device_class": entity.domain,
-                    "name": name,
-                }
+        try:
+            return await self.executor.async_run(
+                ConnectedRoom.devices_sync_request, self.auth["api_key"], payload
             )
+        except (ConnectionError, ExecutorFull):
+            self.metrics.inc("api.errors")
+
+            # Sent again once the cloud can be reached
+            self.outbound.enqueue("devices_sync", DEVICES_SYNC_PATH, payload)
+
+            return False
+        except InvalidAuth:
+            # Only a login rejection stops the entry, the next selection
+            # change syncs again
+            self.metrics.inc("api.errors")
+            _LOGGER.warning("ConnectedRoom rejected the devices sync")
 
+            return False
+
+    def devices_sync_request(api_key, payload):
         headers = {
-            "Authorization": "Bearer " + self.auth["api_key"],
+            "Authorization": "Bearer " + api_key,
             "Accept": "application/json",
         }
 
-        payload = {
-            "devices": to_sync,
-        }
-
         try:
+            # Streamed, the encoded payload is never held in memory at once
             request = httpx.post(
-                API_URL + "/integrations/home-assistant/devices/sync",
-                json=payload,
-                headers=headers,
+                API_URL + DEVICES_SYNC_PATH,
+                content=devices_sync_content(payload),
+                headers={**headers, "Content-Type": "application/json"},
                 verify=False,
             )
         except Exception:
             raise ConnectionError
 
+        if request.status_code >= 500:
+            raise ConnectionError
+
         try:
             json_data = request.json()
         except Exception:
-            raise InvalidAuth
+            raise ConnectionError
 
         if not json_data["success"]:
             raise InvalidAuth
 
         return True
 
-    async def sync_lights(self, colors: dict):
+    def state_reply_request(api_key, payload):
+        headers = {"Authorization": "Bearer " + api_key}
+
+        try:
+            request = httpx.post(
+                API_URL + STATE_REPLY_PATH,
+                json=payload,
+                headers=headers,
+                verify=False,
+            )
+        except Exception:
+            raise ConnectionError
+
+        if request.status_code >= 500:
+            raise ConnectionError
+
+        return True
+
+    def reply_state(self, entity_id, payload):
+        self.metrics.inc("api.state_replies")
+
+        try:
+            ConnectedRoom.state_reply_request(self.auth["api_key"], payload)
+        except ConnectionError:
+            self.metrics.inc("api.errors")
+
+            # Only the latest state of an entity is worth sending later
+            self.outbound.enqueue("state:" + entity_id, STATE_REPLY_PATH, payload)
+
+    def missed_events_request(api_key, since, limit, url=API_URL + MISSED_EVENTS_PATH):
+        headers = {"Authorization": "Bearer " + api_key, "Accept": "application/json"}
+
+        try:
+            request = httpx.get(
+                url,
+                params={"since": since, "limit": limit},
+                headers=headers,
+                verify=False,
+            )
+        except Exception:
+            raise ConnectionError
+
+        if request.status_code >= 500:
+            raise ConnectionError
+
+        try:
+            json_data = request.json()
+        except Exception:
+            return []
+
+        if not isinstance(json_data, dict) or not json_data.get("success"):
+            return []
+
+        return json_data.get("events") or []
+
+    def send_queued(self, path, payload):
+        if self.auth is None:
+            raise ConnectionError
+
+        if path == DEVICES_SYNC_PATH:
+            return ConnectedRoom.devices_sync_request(self.auth["api_key"], payload)
+
+        return ConnectedRoom.state_reply_request(self.auth["api_key"], payload)
+
+    def update_config(self, config: RuntimeConfig):
+        if config.broadcast_delay != self.config.broadcast_delay:
+            self.set_broadcast_delay(config.broadcast_delay)
+
+        if not config.speaker_warm_up:
+            self.warm_up.stop()
+
+        if config.light_targets != self.config.light_targets:
+            self.team_scenes = {}
+
+        self.config = config
+
+    def goal_horn_duration(self, audio_file):
+        """Return the length of a goal horn, None until it is known.
+
+        The file is probed in the background the first time it is seen, the
+        horn playing meanwhile waits for the speakers to become idle.
+        """
+        if audio_file in self.goal_horn_durations:
+            return self.goal_horn_durations[audio_file]
+
+        self.prefetch_goal_horn(audio_file)
+
+        return None
+
+    def prefetch_goal_horn(self, audio_file):
+        if (
+            audio_file in self.goal_horn_durations
+            or audio_file in self._goal_horn_probes
+        ):
+            return
+
+        try:
+            future = self.executor.submit(probe_duration, audio_file)
+        except ExecutorFull:
+            # Not cached, probed again on the next goal
+            return
+
+        self._goal_horn_probes.add(audio_file)
+        self.metrics.inc("horn.duration_probes")
+
+        future.add_done_callback(
+            lambda future: self._on_goal_horn_probed(audio_file, future)
+        )
+
+    def _on_goal_horn_probed(self, audio_file, future):
+        self._goal_horn_probes.discard(audio_file)
+
+        if future.cancelled() or future.exception() is not None:
+            return
+
+        # Unknown lengths are cached too, they use the state fallback
+        self.goal_horn_durations[audio_file] = future.result()
+
+    def call_service(self, domain, service, service_data=None, target=None):
+        """Call a service in the context of the current trace, from any thread."""
+        trace_event("call." + domain + "." + service)
+
+        self.hass.services.call(
+            domain=domain,
+            service=service,
+            service_data=service_data,
+            target=target,
+            context=current_context(),
+        )
+
+    def snapshot_lights(self, colors: dict):
+        """Save the state of the lights of the colour groups, blocking."""
+        run_callback_threadsafe(
+            self.hass.loop, self._async_snapshot_lights, colors
+        ).result()
+
+    @callback
+    def _async_snapshot_lights(self, colors: dict):
+        # A goal starts a celebration, the cloud restores of the lights then
+        # apply again
+        self.restored_lights.clear()
+
         for color in colors:
-            lights = self.coordinator.config_entry.options.get(color + "_lights")
+            for entity_id in self._async_group_lights(color):
+                # Keep the state from before the first goal of a celebration
+                if entity_id in self.light_snapshot:
+                    continue
+
+                state = self.hass.states.get(entity_id)
+                call = light_restore_call(state) if state is not None else None
+
+                if call is not None:
+                    self.light_snapshot[entity_id] = call
+
+        self.coordinator.schedule_save()
+
+    @callback
+    def _async_group_lights(self, color: str) -> list[str]:
+        """Lights of a colour group, also those selected by area or label."""
+        lights = self.config.light_targets.get(color)
+
+        if not lights:
+            return []
+
+        return [
+            entity_id
+            for entity_id in resolve_target(self.hass, lights)
+            if entity_id.startswith("light.")
+        ]
+
+    def restore_lights(self):
+        snapshot = self.light_snapshot
+        self.light_snapshot = {}
+        self.restored_lights.update(snapshot)
+        self.coordinator.schedule_save()
+
+        groups = {}
+
+        for entity_id, call in snapshot.items():
+            groups.setdefault(call, []).append(entity_id)
+
+        for (service, service_data), entity_ids in groups.items():
+            self.call_service(
+                domain="light",
+                service=service,
+                target={"entity_id": entity_ids},
+                service_data=dict(service_data),
+            )
+
+    def compile_team_scenes(self, data: dict):
+        """Compile the celebration scenes of the teams of a new game."""
+        self.team_scenes = {}
+
+        game = data.get("game") if isinstance(data.get("game"), dict) else data
+
+        for side in ("home_team", "away_team"):
+            team = game.get(side)
+
+            if isinstance(team, dict) and team.get("options"):
+                self.team_scene(team)
+
+    def team_scene(self, team: dict):
+        """Scene entities of the celebration of a team, compiled once."""
+        key = team_key(team)
+        entities = self.team_scenes.get(key)
+
+        if entities is None:
+            entities = run_callback_threadsafe(
+                self.hass.loop, self._async_compile_scene, team_colors(team)
+            ).result()
+
+            self.team_scenes[key] = entities
+            self.metrics.inc("lights.scenes_compiled")
+
+        return entities
+
+    @callback
+    def _async_compile_scene(self, colors: dict):
+        entities = {}
+
+        # A light in several groups takes the colour of the last one, as
+        # when every group was turned on in turn
+        for color in colors:
+            entity_ids = self._async_group_lights(color)
+
+            if not entity_ids:
+                continue
+
+            state = {
+                "state": "on",
+                "rgb_color": [
+                    colors[color]["r"],
+                    colors[color]["g"],
+                    colors[color]["b"],
+                ],
+            }
+
+            for entity_id in entity_ids:
+                entities[entity_id] = state
+
+        return entities
+
+    async def sync_lights(self, colors: dict, team: dict | None = None):
+        if team is not None and self.hass.services.has_service("scene", "apply"):
+            entities = self.team_scene(team)
+
+            # Every group changes at once
+            if entities:
+                self.call_service(
+                    domain="scene", service="apply", service_data={"entities": entities}
+                )
+
+            return
+
+        for color in colors:
+            lights = self.config.light_targets.get(color)
 
             if lights:
-                self.hass.services.call(
+                self.call_service(
                     domain="light",
                     service="turn_on",
-                    target=lights,
+                    target=dict(lights),
                     service_data={
                         "rgb_color": [
                             colors[color]["r"],
@@ -242,123 +694,336 @@ class ConnectedRoom:
                     },
                 )
 
-    async def tts(self, message):
-        if self.is_playing_horn:
-            return
+    def schedule_tts(self, delay, message):
+        """Play a message after a delay, on the executor."""
+        self.scheduler.schedule(delay, lambda: self.submit_tts(message), tag=TTS_TAG)
 
-        tts_devices = self.coordinator.config_entry.options.get("tts_devices")
+    def submit_tts(self, message):
+        """Play a message on the executor, the scheduler thread never waits."""
+        try:
+            self.executor.submit(self.run_tts, message)
+        except ExecutorFull:
+            self.metrics.inc("tts.rejected")
 
-        tts_provider = self.coordinator.config_entry.options.get("tts_provider")
+    def run_tts(self, message):
+        asyncio.run(self.tts(message=message))
 
-        tts_service = self.coordinator.config_entry.options.get("tts_service")
+    async def tts(self, message):
+        if self.is_playing_horn:
+            return
 
         if self.last_goal_horn_unsub:
             self.last_goal_horn_unsub()
             self.last_goal_horn_unsub = None
 
-        if self.goal_horn_timer:
-            self.goal_horn_timer.cancel()
-            self.goal_horn_timer = None
+        self.scheduler.cancel(TTS_TAG)
+
+        self.scheduler.cancel(GOAL_HORN_TAG)
 
         self.tts_after_goal_horn = None
 
-        if tts_devices:
-            if tts_service:
-                for tts_device in tts_devices:
-                    self.hass.services.call(
-                        domain="tts",
-                        service=tts_service,
-                        service_data={
-                            "cache": True,
-                            "entity_id": tts_device,
-                            "message": message,
-                        },
-                    )
-            elif tts_provider:
-                for tts_device in tts_devices:
-                    self.hass.services.call(
-                        domain="tts",
-                        service="speak",
-                        service_data={
-                            "cache": True,
-                            "media_player_entity_id": tts_device,
-                            "entity_id": tts_provider,
-                            "message": message,
-                        },
-                    )
+        if not self.config.tts_calls:
+            return
 
+        self.metrics.inc("tts.announcements")
 
-class ConnectedRoomEvents:
-    def __init__(
-        self, connected_room: ConnectedRoom, pusher: pysher.Pusher, unique_id: str
-    ):
-        self.connected_room = connected_room
-        self.pusher = pusher
-        self.unique_id = unique_id
+        if self.config.tts_single_synthesis:
+            try:
+                with trace_span("tts.synthesis"):
+                    url = asyncio.run_coroutine_threadsafe(
+                        self.async_tts_media_url(message), self.hass.loop
+                    ).result(TTS_SYNTHESIS_TIMEOUT)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Unable to synthesize the message once")
+            else:
+                self.measure_start_skew(self.config.tts_devices, "single")
+
+                # One call, the players start the same cached file together
+                self.call_service(
+                    domain="media_player",
+                    service="play_media",
+                    service_data={
+                        "entity_id": list(self.config.tts_devices),
+                        "media_content_id": url,
+                        "media_content_type": "music",
+                    },
+                )
+                return
+
+        self.measure_start_skew(self.config.tts_devices, "per_speaker")
 
-        self.channel = pusher.subscribe("private-" + unique_id)
+        for service, service_data in self.config.tts_service_calls(message):
+            self.call_service(domain="tts", service=service, service_data=service_data)
 
-        self.channel.bind("goal", lambda data, **kargs: asyncio.run(self.on_goal(data)))
-        self.channel.bind(
-            "goal_horn", lambda data, **kargs: asyncio.run(self.on_goal_horn(data))
+    async def async_tts_media_url(self, message):
+        # Only loaded when the single synthesis mode is used
+        # pylint: disable=import-outside-toplevel
+        from homeassistant.components import media_source
+        from homeassistant.components import tts
+        from homeassistant.components.media_player.browse_media import (
+            async_process_play_media_url,
         )
-        self.channel.bind(
-            "period_start",
-            lambda data, **kargs: asyncio.run(self.on_period_start(data)),
+
+        media_source_id = tts.generate_media_source_id(
+            self.hass, message, engine=self.config.tts_provider, cache=True
         )
-        self.channel.bind(
-            "period_end", lambda data, **kargs: asyncio.run(self.on_period_end(data))
+
+        media = await media_source.async_resolve_media(self.hass, media_source_id, None)
+
+        return async_process_play_media_url(self.hass, media.url)
+
+    def measure_start_skew(self, entity_ids, mode):
+        if len(entity_ids) < 2:
+            return
+
+        self.hass.loop.call_soon_threadsafe(
+            self._async_measure_start_skew, tuple(entity_ids), mode
         )
-        self.channel.bind(
-            "game_start", lambda data, **kargs: asyncio.run(self.on_game_start(data))
+
+    @callback
+    def _async_measure_start_skew(self, entity_ids, mode):
+        started = {}
+        unsubs = []
+
+        @callback
+        def finish(*args):
+            self._measurements.discard(finish)
+
+            while unsubs:
+                unsubs.pop()()
+
+            if len(started) == len(entity_ids):
+                self.metrics.observe(
+                    "tts.start_skew." + mode,
+                    max(started.values()) - min(started.values()),
+                )
+
+        @callback
+        def state_changed(event):
+            new_state = event.data.get("new_state")
+
+            if new_state is None or new_state.state != "playing":
+                return
+
+            started.setdefault(event.data["entity_id"], time.monotonic())
+
+            if len(started) == len(entity_ids):
+                finish()
+
+        unsubs.append(
+            event.async_track_state_change_event(self.hass, entity_ids, state_changed)
         )
-        self.channel.bind(
-            "game_end", lambda data, **kargs: asyncio.run(self.on_game_end(data))
+        unsubs.append(event.async_call_later(self.hass, TTS_SKEW_WINDOW, finish))
+        self._measurements.add(finish)
+
+    @callback
+    def _async_stop_measurements(self):
+        for finish in list(self._measurements):
+            finish()
+
+    def measure_horn_latency(self, entity_ids, mode):
+        """Time from play_media to playing, mode is warm or cold."""
+        self.hass.loop.call_soon_threadsafe(
+            self._async_measure_horn_latency,
+            tuple(entity_ids),
+            mode,
+            time.monotonic(),
         )
 
-    async def on_goal(self, data):
-        data = json.loads(data)
+    @callback
+    def _async_measure_horn_latency(self, entity_ids, mode, called_at):
+        pending = set(entity_ids)
+        unsubs = []
+
+        @callback
+        def finish(*args):
+            self._measurements.discard(finish)
+
+            while unsubs:
+                unsubs.pop()()
+
+        @callback
+        def state_changed(event):
+            new_state = event.data.get("new_state")
 
-        registry = dr.async_get(self.connected_room.hass)
+            if new_state is None or new_state.state != "playing":
+                return
 
-        goal_horn_devices = self.connected_room.coordinator.config_entry.options.get(
-            "goal_horn_devices"
+            if event.data["entity_id"] not in pending:
+                return
+
+            pending.discard(event.data["entity_id"])
+
+            self.metrics.observe(
+                "horn.start_latency." + mode, time.monotonic() - called_at
+            )
+
+            if not pending:
+                finish()
+
+        unsubs.append(
+            event.async_track_state_change_event(self.hass, entity_ids, state_changed)
         )
+        unsubs.append(event.async_call_later(self.hass, TTS_SKEW_WINDOW, finish))
+        self._measurements.add(finish)
 
-        if (
-            "already_triggered_from_score_change" not in data
-            or data.already_triggered_from_score_change is not True
-        ):
-            devices = dr.async_entries_for_config_entry(
-                registry, self.connected_room.coordinator.config_entry.entry_id
+
+class ConnectedRoomEvents:
+    def __init__(self, connected_room: ConnectedRoom, unique_id: str):
+        self.connected_room = connected_room
+        self.unique_id = unique_id
+
+        subscriptions = connected_room.subscriptions
+        channel_name = "private-" + unique_id
+
+        self.channel = subscriptions.subscribe(channel_name)
+
+        self.handlers = {
+            "goal": self.on_goal,
+            "goal_horn": self.on_goal_horn,
+            "period_start": self.on_period_start,
+            "period_end": self.on_period_end,
+            "game_start": self.on_game_start,
+            "game_end": self.on_game_end,
+        }
+
+        # Celebrations go ahead of the device commands queued before them
+        self.event_classes = {
+            "goal": EVENT_CLASS_CELEBRATION,
+            "goal_horn": EVENT_CLASS_CELEBRATION,
+        }
+
+        for event_name, handler in self.handlers.items():
+            subscriptions.bind(
+                channel_name,
+                event_name,
+                self.dispatch(
+                    handler, self.event_classes.get(event_name, EVENT_CLASS_GAME)
+                ),
             )
 
-            for device in devices:
-                event_data = {
-                    "type": "goal",
+    def dispatch(self, handler, event_class=EVENT_CLASS_GAME):
+        return lambda data, **kargs: self.connected_room.dispatch(
+            handler, data, event_class
+        )
+
+    def replay(self, event_name: str, data: dict, fresh: bool):
+        """Handle a missed event, only its side effects when it is stale."""
+        connected_room = self.connected_room
+        handler = self.handlers.get(event_name)
+
+        if handler is None:
+            return
+
+        if fresh:
+            # Delayed and queued like a live event, behind the same worker.
+            # Kept in order in the game class, from the celebration class a
+            # goal would run before an earlier game_start that then resets it.
+            connected_room.metrics.inc("catch_up.replayed")
+            connected_room.dispatch(handler, json.dumps(data), EVENT_CLASS_GAME)
+            return
+
+        # A late goal horn or announcement is worse than none
+        if event_name == "goal_horn":
+            connected_room.metrics.inc("catch_up.skipped")
+            return
+
+        # Side effects only, on the queue worker that owns the game state
+        connected_room.enqueue(
+            EVENT_CLASS_GAME, self.on_missed_event, event_name, json.dumps(data)
+        )
+
+    async def on_missed_event(self, event_name: str, data):
+        connected_room = self.connected_room
+        data = json.loads(data)
+
+        if not connected_room.coordinator.is_new_event(event_name, data):
+            connected_room.metrics.inc("catch_up.skipped")
+            return
+
+        connected_room.metrics.inc("catch_up.stale")
+        connected_room.coordinator.update_game(event_name, data)
+        self.fire_event(event_name, data)
+
+        if event_name == "game_end":
+            connected_room.warm_up.stop()
+
+            if connected_room.light_snapshot:
+                connected_room.restore_lights()
+
+    def fire_event(self, event_type: str, data: dict):
+        """Fire connectedroom_event for the devices of the entry."""
+        connected_room = self.connected_room
+        config = connected_room.config
+        entry_id = connected_room.coordinator.config_entry.entry_id
+
+        devices = dr.async_entries_for_config_entry(
+            dr.async_get(connected_room.hass), entry_id
+        )
+
+        if not devices:
+            return
+
+        payload = event_payload(data, config.event_payload_fields)
+        context = current_context()
+
+        if config.single_event:
+            # One event for the whole entry, device triggers match device_ids
+            events = [
+                {
+                    "type": event_type,
+                    "device_id": devices[0].id,
+                    "device_ids": [device.id for device in devices],
+                    "entity_id": entry_id,
+                    "payload": payload,
+                }
+            ]
+        else:
+            events = [
+                {
+                    "type": event_type,
                     "device_id": device.id,
-                    "entity_id": self.connected_room.coordinator.config_entry.entry_id,
-                    "payload": data,
+                    "entity_id": entry_id,
+                    "payload": payload,
                 }
+                for device in devices
+            ]
 
-                try:
-                    self.connected_room.hass.bus.fire("connectedroom_event", event_data)
-                except Exception:
-                    _LOGGER.error("Error while running automation")
+        for event_data in events:
+            if context is not None:
+                event_data["trace_id"] = context.id
 
-            if data["team"] is not None and data["team"]["options"] is not None:
-                colors = {}
+            try:
+                connected_room.hass.bus.fire(
+                    EVENT_CONNECTEDROOM, event_data, context=context
+                )
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.error("Error while running automation")
+
+        connected_room.metrics.inc("bus.events_fired", len(events))
+
+    async def on_goal(self, data):
+        data = json.loads(data)
+
+        if not self.connected_room.coordinator.is_new_event("goal", data):
+            return
 
-                if data["team"]["options"]["primary_color_rgb"] is not None:
-                    colors["primary"] = data["team"]["options"]["primary_color_rgb"]
+        self.connected_room.coordinator.update_game("goal", data)
 
-                if data["team"]["options"]["secondary_color_rgb"] is not None:
-                    colors["secondary"] = data["team"]["options"]["secondary_color_rgb"]
+        goal_horn_devices = self.connected_room.config.goal_horn_devices
 
-                if data["team"]["options"]["alternate_color_rgb"] is not None:
-                    colors["alternate"] = data["team"]["options"]["alternate_color_rgb"]
+        if (
+            "already_triggered_from_score_change" not in data
+            or data.already_triggered_from_score_change is not True
+        ):
+            self.fire_event("goal", data)
+
+            if data["team"] is not None and data["team"]["options"] is not None:
+                colors = team_colors(data["team"])
+
+                self.connected_room.snapshot_lights(colors)
 
-                await self.connected_room.sync_lights(colors)
+                await self.connected_room.sync_lights(colors, data["team"])
 
             self.connected_room.tts_after_goal_horn = None
 
@@ -368,38 +1033,28 @@ class ConnectedRoomEvents:
                 else:
                     self.connected_room.tts_after_goal_horn = data["natural_text"]
 
-                    if self.connected_room.goal_horn_timer:
-                        self.connected_room.goal_horn_timer.cancel()
-                        self.connected_room.goal_horn_timer = None
+                    self.connected_room.scheduler.cancel(TTS_TAG)
 
                     if self.connected_room.last_goal_horn_unsub:
                         self.connected_room.last_goal_horn_unsub()
                         self.connected_room.last_goal_horn_unsub = None
 
-                    self.connected_room.goal_horn_timer = Timer(
-                        3.0,
-                        lambda: asyncio.run(
-                            self.connected_room.tts(
-                                message=self.connected_room.tts_after_goal_horn
-                            )
-                        ),
+                    self.connected_room.schedule_tts(
+                        3.0, self.connected_room.tts_after_goal_horn
                     )
-                    self.connected_room.goal_horn_timer.start()
 
     async def on_goal_horn(self, data):
         data = json.loads(data)
 
-        goal_horn_devices = self.connected_room.coordinator.config_entry.options.get(
-            "goal_horn_devices"
-        )
+        goal_horn_devices = self.connected_room.config.goal_horn_devices
 
         if self.connected_room.last_goal_horn_unsub:
             self.connected_room.last_goal_horn_unsub()
             self.connected_room.last_goal_horn_unsub = None
 
-        if self.connected_room.goal_horn_timer:
-            self.connected_room.goal_horn_timer.cancel()
-            self.connected_room.goal_horn_timer = None
+        self.connected_room.scheduler.cancel(TTS_TAG)
+
+        self.connected_room.scheduler.cancel(GOAL_HORN_TAG)
 
         goal_horn = data["audioFile"]
 
@@ -409,8 +1064,18 @@ class ConnectedRoomEvents:
 
             self.connected_room.is_playing_horn = True
 
+            self.connected_room.metrics.inc("horn.played")
+
+            # Read before play_media wakes the players up
+            self.connected_room.measure_horn_latency(
+                goal_horn_devices,
+                "warm"
+                if self.connected_room.warm_up.is_warm(goal_horn_devices)
+                else "cold",
+            )
+
             for goal_horn_device in goal_horn_devices:
-                self.connected_room.hass.services.call(
+                self.connected_room.call_service(
                     domain="media_player",
                     service="play_media",
                     service_data={
@@ -420,6 +1085,17 @@ class ConnectedRoomEvents:
                     },
                 )
 
+            duration = self.connected_room.goal_horn_duration(goal_horn)
+
+            if duration is not None:
+                self.connected_room.scheduler.schedule(
+                    duration + GOAL_HORN_TTS_GAP,
+                    self.goal_horn_deadline,
+                    tag=GOAL_HORN_TAG,
+                )
+                return
+
+            # Unknown length, wait for the speakers to become idle instead
             self.connected_room.last_goal_horn_unsub = (
                 event.async_track_state_change_event(
                     self.connected_room.hass,
@@ -429,16 +1105,14 @@ class ConnectedRoomEvents:
             )
 
     def stop_goal_horn(self):
-        if self.connected_room.goal_horn_timer:
-            self.connected_room.goal_horn_timer.cancel()
-            self.connected_room.goal_horn_timer = None
+        self.connected_room.scheduler.cancel(TTS_TAG)
 
-        goal_horn_devices = self.connected_room.coordinator.config_entry.options.get(
-            "goal_horn_devices"
-        )
+        self.connected_room.scheduler.cancel(GOAL_HORN_TAG)
+
+        goal_horn_devices = self.connected_room.config.goal_horn_devices
 
         for goal_horn_device in goal_horn_devices:
-            self.connected_room.hass.services.call(
+            self.connected_room.call_service(
                 domain="media_player",
                 service="media_stop",
                 service_data={"entity_id": goal_horn_device},
@@ -467,48 +1141,49 @@ class ConnectedRoomEvents:
                 or new_state.attributes["media_content_id"]
                 == old_state.attributes["media_content_id"]
             ):
-                self.connected_room.is_playing_horn = False
+                message = self.goal_horn_done()
+
+                if message is not None:
+                    self.connected_room.schedule_tts(GOAL_HORN_TTS_GAP, message)
+
+    def goal_horn_deadline(self):
+        if not self.connected_room.is_playing_horn:
+            return
+
+        message = self.goal_horn_done()
 
-                if self.connected_room.stay_on_goal_horn:
-                    self.connected_room.stay_on_goal_horn = False
-                    return
+        if message is not None:
+            # Keep the scheduler thread free for the next deadlines
+            self.connected_room.submit_tts(message)
 
-                if self.connected_room.goal_horn_timer:
-                    self.connected_room.goal_horn_timer.cancel()
-                    self.connected_room.goal_horn_timer = None
+    def goal_horn_done(self):
+        """Mark the horn as done and return the TTS message to play after it."""
+        self.connected_room.is_playing_horn = False
 
-                if self.connected_room.last_goal_horn_unsub:
-                    self.connected_room.last_goal_horn_unsub()
-                    self.connected_room.last_goal_horn_unsub = None
+        if self.connected_room.stay_on_goal_horn:
+            self.connected_room.stay_on_goal_horn = False
+            return None
 
-                if self.connected_room.tts_after_goal_horn is not None:
-                    message = self.connected_room.tts_after_goal_horn
+        self.connected_room.scheduler.cancel(TTS_TAG)
 
-                    self.connected_room.goal_horn_timer = Timer(
-                        1.0,
-                        lambda: asyncio.run(self.connected_room.tts(message=message)),
-                    )
-                    self.connected_room.goal_horn_timer.start()
-                    self.connected_room.tts_after_goal_horn = None
+        if self.connected_room.last_goal_horn_unsub:
+            self.connected_room.last_goal_horn_unsub()
+            self.connected_room.last_goal_horn_unsub = None
+
+        message = self.connected_room.tts_after_goal_horn
+        self.connected_room.tts_after_goal_horn = None
+
+        return message
 
     async def on_period_start(self, data):
         data = json.loads(data)
 
-        registry = dr.async_get(self.connected_room.hass)
-
-        devices = dr.async_entries_for_config_entry(
-            registry, self.connected_room.coordinator.config_entry.entry_id
-        )
+        if not self.connected_room.coordinator.is_new_event("period_start", data):
+            return
 
-        for device in devices:
-            event_data = {
-                "type": "period_start",
-                "device_id": device.id,
-                "entity_id": self.connected_room.coordinator.config_entry.entry_id,
-                "payload": data,
-            }
+        self.connected_room.coordinator.update_game("period_start", data)
 
-            self.connected_room.hass.bus.fire("connectedroom_event", event_data)
+        self.fire_event("period_start", data)
 
         if "natural_text" in data and data["natural_text"] is not None:
             await self.connected_room.tts(data["natural_text"])
@@ -516,21 +1191,12 @@ class ConnectedRoomEvents:
     async def on_period_end(self, data):
         data = json.loads(data)
 
-        registry = dr.async_get(self.connected_room.hass)
-
-        devices = dr.async_entries_for_config_entry(
-            registry, self.connected_room.coordinator.config_entry.entry_id
-        )
+        if not self.connected_room.coordinator.is_new_event("period_end", data):
+            return
 
-        for device in devices:
-            event_data = {
-                "type": "period_end",
-                "device_id": device.id,
-                "entity_id": self.connected_room.coordinator.config_entry.entry_id,
-                "payload": data,
-            }
+        self.connected_room.coordinator.update_game("period_end", data)
 
-            self.connected_room.hass.bus.fire("connectedroom_event", event_data)
+        self.fire_event("period_end", data)
 
         if "natural_text" in data and data["natural_text"] is not None:
             await self.connected_room.tts(data["natural_text"])
@@ -538,21 +1204,17 @@ class ConnectedRoomEvents:
     async def on_game_start(self, data):
         data = json.loads(data)
 
-        registry = dr.async_get(self.connected_room.hass)
+        if not self.connected_room.coordinator.is_new_event("game_start", data):
+            return
 
-        devices = dr.async_entries_for_config_entry(
-            registry, self.connected_room.coordinator.config_entry.entry_id
-        )
+        self.connected_room.coordinator.update_game("game_start", data)
 
-        for device in devices:
-            event_data = {
-                "type": "game_start",
-                "device_id": device.id,
-                "entity_id": self.connected_room.coordinator.config_entry.entry_id,
-                "payload": data,
-            }
+        self.fire_event("game_start", data)
+
+        self.connected_room.compile_team_scenes(data)
 
-            self.connected_room.hass.bus.fire("connectedroom_event", event_data)
+        if self.connected_room.config.speaker_warm_up:
+            self.connected_room.warm_up.start()
 
         if "natural_text" in data and data["natural_text"] is not None:
             await self.connected_room.tts(data["natural_text"])
@@ -560,100 +1222,96 @@ class ConnectedRoomEvents:
     async def on_game_end(self, data):
         data = json.loads(data)
 
-        registry = dr.async_get(self.connected_room.hass)
+        if not self.connected_room.coordinator.is_new_event("game_end", data):
+            return
 
-        devices = dr.async_entries_for_config_entry(
-            registry, self.connected_room.coordinator.config_entry.entry_id
-        )
+        self.connected_room.coordinator.update_game("game_end", data)
 
-        for device in devices:
-            event_data = {
-                "type": "game_end",
-                "device_id": device.id,
-                "entity_id": self.connected_room.coordinator.config_entry.entry_id,
-                "payload": data,
-            }
+        self.fire_event("game_end", data)
 
-            self.connected_room.hass.bus.fire("connectedroom_event", event_data)
+        self.connected_room.warm_up.stop()
+
+        if self.connected_room.light_snapshot:
+            self.connected_room.restore_lights()
 
         if "natural_text" in data and data["natural_text"] is not None:
             await self.connected_room.tts(data["natural_text"])
 
 
 class ConnectedRoomDeviceEvents:
-    def __init__(
-        self, connected_room: ConnectedRoom, pusher: pysher.Pusher, integration_key: str
-    ):
+    def __init__(self, connected_room: ConnectedRoom, integration_key: str):
         self.connected_room = connected_room
-        self.pusher = pusher
         self.integration_key = integration_key
+        self.channel_name = "private-home-assistant." + integration_key
 
-        self.channel = pusher.subscribe("private-home-assistant." + integration_key)
+        self.channel = connected_room.subscriptions.subscribe(self.channel_name)
 
-        devices = self.connected_room.coordinator.config_entry.options.get("devices")
+        self.bind_devices()
 
-        if devices is not None and devices["entity_id"] is not None:
-            for entity_id in devices["entity_id"]:
-                if ("execute." + entity_id) not in self.channel.event_callbacks:
-                    self.channel.bind(
-                        "execute." + entity_id,
-                        lambda data, entity_id_local=entity_id, **kargs: asyncio.run(
-                            self.on_execute(data, entity_id_local)
-                        ),
+    def bind_devices(self):
+        subscriptions = self.connected_room.subscriptions
+
+        self.connected_room.commands.async_build(self.connected_room.devices.entity_ids)
+
+        device_events = set()
+
+        for entity_id in self.connected_room.devices.entity_ids:
+            device_events.update(("execute." + entity_id, "get_state." + entity_id))
+
+        # Devices no longer selected stop receiving commands
+        for event_name in subscriptions.bound_events(self.channel_name) - device_events:
+            subscriptions.unbind(self.channel_name, event_name)
+
+        for entity_id in self.connected_room.devices.entity_ids:
+            subscriptions.bind(
+                self.channel_name,
+                "execute." + entity_id,
+                lambda data, entity_id_local=entity_id, **kargs: (
+                    self.connected_room.enqueue(
+                        EVENT_CLASS_EXECUTE, self.on_execute, data, entity_id_local
                     )
+                ),
+            )
 
-                if ("get_state." + entity_id) not in self.channel.event_callbacks:
-                    self.channel.bind(
-                        "get_state." + entity_id,
-                        lambda data, entity_id_local=entity_id, **kargs: asyncio.run(
-                            self.on_get_state(data, entity_id_local)
-                        ),
+            subscriptions.bind(
+                self.channel_name,
+                "get_state." + entity_id,
+                lambda data, entity_id_local=entity_id, **kargs: (
+                    self.connected_room.enqueue(
+                        EVENT_CLASS_STATE, self.on_get_state, data, entity_id_local
                     )
+                ),
+            )
 
     async def on_execute(self, data, entity_id):
         data = json.loads(data)
 
-        if data["action"] == "set_color":
-            self.connected_room.hass.services.call(
-                domain="light",
-                service="turn_on",
-                target={"entity_id": [entity_id]},
-                service_data={"xy_color": {data["color"][0], data["color"][1]}},
-            )
+        if data["action"] == "restore":
+            # The first restore of a light in the snapshot taken before the goal
+            # restores the whole celebration locally, the restores of the other
+            # lights of the snapshot are then already done
+            if entity_id in self.connected_room.light_snapshot:
+                self.connected_room.restore_lights()
+                return
 
-        elif data["action"] == "set_effect":
-            self.connected_room.hass.services.call(
-                domain="light",
-                service="turn_on",
-                target={"entity_id": [entity_id]},
-                service_data={"effect": data["effect"]},
-            )
+            if entity_id in self.connected_room.restored_lights:
+                self.connected_room.metrics.inc("commands.restored")
+                return
 
-        elif data["action"] == "set_brightness":
-            self.connected_room.hass.services.call(
-                domain="light",
-                service="turn_on",
-                target={"entity_id": [entity_id]},
-                service_data={"brightness": data["brightness"]},
-            )
+        call = self.connected_room.commands.get(entity_id).translate(data)
 
-        elif data["action"] == "turn_off":
-            self.connected_room.hass.services.call(
-                domain="light", service="turn_off", target={"entity_id": [entity_id]}
-            )
+        if call is None:
+            self.connected_room.metrics.inc("commands.unsupported")
+            return
 
-        elif data["action"] == "turn_on":
-            self.connected_room.hass.services.call(
-                domain="light", service="turn_on", target={"entity_id": [entity_id]}
-            )
+        domain, service, service_data = call
 
-        elif data["action"] == "restore":
-            self.connected_room.hass.services.call(
-                domain="light",
-                service="turn_on",
-                target={"entity_id": [entity_id]},
-                service_data=data["state"],
-            )
+        self.connected_room.call_service(
+            domain=domain,
+            service=service,
+            target={"entity_id": [entity_id]},
+            service_data=service_data,
+        )
 
     async def on_get_state(self, data, entity_id):
         data = json.loads(data)
@@ -665,23 +1323,170 @@ class ConnectedRoomDeviceEvents:
 
         state = self.connected_room.hass.states.get(entity_id)
 
-        headers = {"Authorization": "Bearer " + self.connected_room.auth["api_key"]}
-
         payload = {
             "scope": "home-assistant." + self.connected_room.auth["integration_key"],
             "payload": json.dumps(state.attributes),
             "request_id": data["request_id"],
         }
 
+        # Sent from the executor, the pusher thread goes back to the events
         try:
-            httpx.post(
-                API_URL + "/requests/execute",
-                json=payload,
-                headers=headers,
-                verify=False,
+            self.connected_room.executor.submit(
+                self.connected_room.reply_state, entity_id, payload
             )
-        except Exception:
-            raise ConnectionError
+        except ExecutorFull:
+            self.connected_room.outbound.enqueue(
+                "state:" + entity_id, STATE_REPLY_PATH, payload
+            )
+
+
+def missed_events(missed):
+    """Decode the missed events, the latest MAX_CATCH_UP_EVENTS oldest first."""
+    events = []
+
+    for item in missed:
+        if not isinstance(item, dict) or not item.get("event"):
+            continue
+
+        data = item.get("data")
+
+        if isinstance(data, str):
+            try:
+                data = json.loads(data)
+            except ValueError:
+                continue
+
+        if not isinstance(data, dict):
+            continue
+
+        timestamp = event_timestamp(item) or event_timestamp(data)
+        events.append((item["event"], data, timestamp))
+
+    events.sort(key=lambda event: event[2] or 0)
+
+    return events[-MAX_CATCH_UP_EVENTS:]
+
+
+@callback
+def device_sync_entries(hass, entity_ids):
+    """Describe the entities to sync, skipping those no longer registered."""
+    entities = er.async_get(hass).entities
+    device_registry = dr.async_get(hass)
+    # Devices usually have several of the synced entities
+    device_names = {}
+    to_sync = []
+
+    for entity_id in entity_ids:
+        entity = entities.get(entity_id)
+
+        if entity is None:
+            continue
+
+        name = entity.original_name
+
+        if name is None:
+            if entity.device_id not in device_names:
+                device = device_registry.async_get(entity.device_id)
+                device_names[entity.device_id] = device.name if device else None
+
+            name = device_names[entity.device_id] or entity.name or entity_id
+
+        to_sync.append(
+            {
+                "entity_id": entity_id,
+                "capabilities": entity.capabilities,
+                "device_class": entity.domain,
+                "name": name,
+            }
+        )
+
+    return to_sync
+
+
+def devices_sync_content(payload, chunk_size=DEVICES_SYNC_CHUNK_BYTES):
+    """Encode a devices sync payload in chunks of about chunk_size bytes."""
+    chunk = [b'{"devices":[']
+    size = 0
+
+    for index, device in enumerate(payload["devices"]):
+        encoded = (b"," if index else b"") + json.dumps(device).encode("utf-8")
+        chunk.append(encoded)
+        size += len(encoded)
+
+        if size >= chunk_size:
+            yield b"".join(chunk)
+            chunk = []
+            size = 0
+
+    chunk.append(b"]}")
+
+    yield b"".join(chunk)
+
+
+def event_payload(data, fields):
+    """Keep only the configured fields of a payload, all of them by default."""
+    if not fields or not isinstance(data, dict):
+        return data
+
+    return {field: data[field] for field in fields if field in data}
+
+
+def team_colors(team):
+    """Colours of the light groups for a team, by group."""
+    options = team.get("options") or {}
+
+    return {
+        color: options[color + "_color_rgb"]
+        for color in LIGHT_COLORS
+        if options.get(color + "_color_rgb") is not None
+    }
+
+
+def team_key(team):
+    key = team.get("id") or team.get("name")
+
+    if key is None:
+        # Unnamed teams are told apart by their colours
+        return json.dumps(team.get("options"), sort_keys=True)
+
+    return str(key)
+
+
+def light_restore_call(state):
+    """Call restoring a light to its state, None when the state is unknown."""
+    if state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
+        return None
+
+    if state.state != "on":
+        return ("turn_off", ())
+
+    service_data = {}
+
+    if state.attributes.get("brightness") is not None:
+        service_data["brightness"] = state.attributes["brightness"]
+
+    color_attribute = LIGHT_COLOR_ATTRIBUTES.get(state.attributes.get("color_mode"))
+
+    if color_attribute and state.attributes.get(color_attribute) is not None:
+        service_data[color_attribute] = tuple(state.attributes[color_attribute])
+
+    return ("turn_on", tuple(sorted(service_data.items())))
+
+
+def light_snapshot_from_stored(stored):
+    """Rebuild a light snapshot saved as JSON, where tuples became lists."""
+    snapshot = {}
+
+    for entity_id, (service, service_data) in stored or ():
+        snapshot[entity_id] = (
+            service,
+            tuple(
+                (key, tuple(value) if isinstance(value, list) else value)
+                for key, value in service_data
+            ),
+        )
+
+    return snapshot
 
 
 class InvalidAuth(HomeAssistantError):
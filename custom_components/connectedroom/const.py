@@ -5,7 +5,58 @@ DOMAIN = "connectedroom"
 
 
 API_URL = "https://api.connectedroom.io"
+DEVICES_SYNC_PATH = "/integrations/home-assistant/devices/sync"
+# The devices sync body is streamed in chunks of about this many bytes
+DEVICES_SYNC_CHUNK_BYTES = 64 * 1024
+STATE_REPLY_PATH = "/requests/execute"
+MISSED_EVENTS_PATH = "/integrations/home-assistant/events"
+
 WSS_HOST = "ws.connectedroom.io"
 WSS_KEY = "RiWn4MQFEc3yEEdbWYRFu8mV7HvkBW"
 
+EVENT_CONNECTEDROOM = "connectedroom_event"
+# Suggested in the options, any other field of the payload can be typed in
+EVENT_PAYLOAD_FIELDS = ["team", "natural_text"]
+
+BROADCAST_DELAY_TAG = "broadcast_delay"
+MAX_BROADCAST_DELAY = 120
+
+GOAL_HORN_TAG = "goal_horn"
+# Seconds between the end of the goal horn and the goal announcement
+GOAL_HORN_TTS_GAP = 1.0
+
+# Goal horn and TTS players are woken up this often during a game
+WARM_UP_TAG = "warm_up"
+WARM_UP_INTERVAL = 240
+
+# Deferred announcements, the goal horn deadline keeps its own tag
+TTS_TAG = "tts"
+TTS_SYNTHESIS_TIMEOUT = 15
+TTS_SKEW_WINDOW = 15
+
+# Events missed while disconnected, only the latest ones of the last hours
+# are fetched. Horn, lights and TTS are only played for the fresh ones.
+MAX_CATCH_UP_EVENTS = 50
+MAX_CATCH_UP_AGE = 3 * 3600
+CATCH_UP_FRESHNESS = 30
+
+# Event classes of the handler queue, by priority (lowest first) with the
+# max age in seconds after which a queued event is dropped instead of played
+EVENT_CLASS_CELEBRATION = "celebration"
+EVENT_CLASS_GAME = "game"
+EVENT_CLASS_EXECUTE = "execute"
+EVENT_CLASS_STATE = "state"
+EVENT_CLASSES = {
+    EVENT_CLASS_CELEBRATION: (0, 15),
+    EVENT_CLASS_GAME: (1, None),
+    EVENT_CLASS_EXECUTE: (2, 10),
+    EVENT_CLASS_STATE: (3, 30),
+}
+
+DATA_EXECUTOR = DOMAIN + "_executor"
+DATA_HUB = DOMAIN + "_hub"
+DATA_PROFILER = DOMAIN + "_profiler"
+DATA_TRACER = DOMAIN + "_tracer"
+MAX_PROFILE_DURATION = 600
+
 VERSION = "1.0.8"
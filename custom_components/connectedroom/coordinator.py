@@ -1,16 +1,38 @@
 """DataUpdateCoordinator for WLED."""
 from __future__ import annotations
 
+import asyncio
 import logging
+import threading
+import time
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import EVENT_HOMEASSISTANT_STOP
 from homeassistant.core import callback
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
 from .connectedroom import ConnectedRoom
+from .connectedroom import event_payload
+from .connectedroom import InvalidAuth
+from .connectedroom import light_snapshot_from_stored
 from .const import DOMAIN
+from .game import DUPLICATE_WINDOW
+from .game import event_key
+from .game import event_timestamp
+from .game import GameState
+from .game import MAX_RECENT_EVENTS
+
+RETRY_MIN_DELAY = 5
+RETRY_MAX_DELAY = 300
+
+# Game updates within this many seconds are written to the state machine once
+GAME_UPDATE_COOLDOWN = 2
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 10
 
 LOGGER = logging.getLogger(__name__)
 
@@ -24,34 +46,178 @@ class ConnectedRoomCoordinator(DataUpdateCoordinator):
         self,
         hass: HomeAssistant,
         entry: ConfigEntry,
+        store: Store | None = None,
+        restored: dict | None = None,
     ) -> None:
         super().__init__(hass, LOGGER, name=DOMAIN)
 
         self.config_entry = entry
-        self._api_key = entry.data["api_key"]
+        self.api_key = entry.data["api_key"]
         self._unique_id = entry.data["unique_id"]
         self.connectedroom = ConnectedRoom(hass, self)
         self.hass = hass
         self.socket = None
+        self._store = store
+        self._recent_events_lock = threading.Lock()
+
+        # The state saved before a restart, sensors and de-duplication work
+        # from the first event, before the connection is up
+        restored = restored or {}
+        self.game = GameState.from_dict(restored.get("game"))
+        self.recent_events: dict[str, float] = dict(restored.get("recent_events", {}))
+        # Missed events are fetched from there after a reconnect
+        self.last_event_at: float | None = restored.get("last_event_at")
+        self.connectedroom.light_snapshot = light_snapshot_from_stored(
+            restored.get("light_snapshot")
+        )
+        self.data = {"ready": False, "game": self.game.as_dict()}
+        self._game_debouncer = Debouncer(
+            hass,
+            LOGGER,
+            cooldown=GAME_UPDATE_COOLDOWN,
+            immediate=True,
+            function=self._async_publish_game,
+        )
 
     @callback
-    def _use_websocket(self) -> None:
-        """Use WebSocket for updates, instead of polling."""
+    def async_start(self) -> None:
+        """Connect in the background, setup does not wait for the cloud."""
 
-        async def listen() -> None:
-            """Listen for state changes via WebSocket."""
+        self.connectedroom.do_not_reconnect = False
 
-            self.socket = await self.connectedroom.setup(self._api_key, self._unique_id)
+        # Follow the entities, devices, areas and labels of the selection
+        self.config_entry.async_on_unload(self.connectedroom.devices.async_start())
 
         # Clean disconnect WebSocket on Home Assistant shutdown
-        self.unsub = self.hass.bus.async_listen_once(
-            EVENT_HOMEASSISTANT_STOP, lambda event: self.stop()
+        self.config_entry.async_on_unload(
+            self.hass.bus.async_listen_once(
+                EVENT_HOMEASSISTANT_STOP, lambda event: self.stop()
+            )
         )
 
-        # Start listening
         self.config_entry.async_create_background_task(
-            self.hass, listen(), "connectedroom-listen"
+            self.hass, self._async_supervise(), "connectedroom-listen"
+        )
+
+    async def _async_supervise(self) -> None:
+        """Log in, connect and sync the devices, retrying with a backoff."""
+
+        started = time.monotonic()
+        delay = RETRY_MIN_DELAY
+        attempts = 0
+
+        await self.connectedroom.outbound.async_load()
+
+        while not self.connectedroom.do_not_reconnect:
+            attempts += 1
+            self.connectedroom.metrics.inc("startup.attempts")
+
+            try:
+                self.socket = await self.connectedroom.setup(
+                    self.api_key, self._unique_id
+                )
+            except InvalidAuth:
+                LOGGER.error("ConnectedRoom rejected the API key, not retrying")
+                return
+            except Exception:  # pylint: disable=broad-except
+                LOGGER.warning(
+                    "Unable to connect to ConnectedRoom (attempt %s), retrying in %s seconds",
+                    attempts,
+                    delay,
+                    exc_info=LOGGER.isEnabledFor(logging.DEBUG),
+                )
+            else:
+                ready_time = time.monotonic() - started
+                self.connectedroom.metrics.set("startup.ready_seconds", ready_time)
+                LOGGER.debug("ConnectedRoom ready after %.2f seconds", ready_time)
+
+                self.async_set_updated_data({**self.data, "ready": True})
+                return
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RETRY_MAX_DELAY)
+
+    def is_new_event(self, event_type: str, data) -> bool:
+        """Return False for an event already handled, from any thread.
+
+        Events without an id or a timestamp are never de-duplicated.
+        """
+        key = event_key(event_type, data)
+        now = time.time()
+
+        with self._recent_events_lock:
+            for seen_key, seen in list(self.recent_events.items()):
+                if now - seen > DUPLICATE_WINDOW:
+                    del self.recent_events[seen_key]
+
+            if key in self.recent_events:
+                self.connectedroom.metrics.inc("events.duplicates")
+                return False
+
+            if key is not None:
+                self.recent_events[key] = now
+
+            self.last_event_at = max(
+                self.last_event_at or 0, event_timestamp(data) or now
+            )
+
+            while len(self.recent_events) > MAX_RECENT_EVENTS:
+                del self.recent_events[next(iter(self.recent_events))]
+
+        self.schedule_save()
+
+        return True
+
+    def schedule_save(self) -> None:
+        """Save the state after a short delay, from any thread."""
+        if self._store is not None:
+            self.hass.loop.call_soon_threadsafe(self._async_schedule_save)
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def _data_to_save(self) -> dict:
+        with self._recent_events_lock:
+            recent_events = dict(self.recent_events)
+
+        return {
+            "game": self.game.as_stored(),
+            "recent_events": recent_events,
+            "last_event_at": self.last_event_at,
+            "light_snapshot": list(dict(self.connectedroom.light_snapshot).items()),
+        }
+
+    def update_game(self, event_type: str, data: dict) -> None:
+        """Apply a game event to the game sensors, from any thread."""
+        self.hass.loop.call_soon_threadsafe(self._async_update_game, event_type, data)
+
+    @callback
+    def _async_update_game(self, event_type: str, data: dict) -> None:
+        self.game.update(
+            event_type,
+            data,
+            event_payload(data, self.connectedroom.config.event_payload_fields),
         )
+        self._game_debouncer.async_schedule_call()
+
+        if self._store is not None:
+            self._async_schedule_save()
+
+    def schedule_update(self) -> None:
+        """Update the entities through the debouncer, from any thread."""
+        self.hass.loop.call_soon_threadsafe(self._game_debouncer.async_schedule_call)
+
+    @callback
+    def _async_publish_game(self) -> None:
+        self.async_set_updated_data({**self.data, "game": self.game.as_dict()})
+
+    async def async_shutdown(self) -> None:
+        await super().async_shutdown()
+        self._game_debouncer.async_shutdown()
+
+        if self._store is not None:
+            await self._store.async_save(self._data_to_save())
 
     def stop(self):
         """Close WebSocket connection."""
@@ -59,9 +225,6 @@ class ConnectedRoomCoordinator(DataUpdateCoordinator):
             self.connectedroom.stop()
 
     async def _async_update_data(self):
-        """Fetch data from WLED."""
-
-        if self.connectedroom is not None:
-            self.connectedroom.do_not_reconnect = False
+        """Return the current data, ConnectedRoom pushes its updates."""
 
-        self._use_websocket()
+        return self.data
@@ -1,17 +1,20 @@
 """Provides device triggers for ConnectedRoom."""
 from __future__ import annotations
 
+from collections.abc import Mapping
 from typing import Any
 
 import voluptuous as vol
 from homeassistant.components.device_automation import DEVICE_TRIGGER_BASE_SCHEMA
-from homeassistant.components.homeassistant.triggers import event as event_trigger
 from homeassistant.const import CONF_DEVICE_ID
 from homeassistant.const import CONF_DOMAIN
 from homeassistant.const import CONF_ENTITY_ID
 from homeassistant.const import CONF_PLATFORM
 from homeassistant.const import CONF_TYPE
+from homeassistant.core import callback
 from homeassistant.core import CALLBACK_TYPE
+from homeassistant.core import Event
+from homeassistant.core import HassJob
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers import config_validation as cv
 from homeassistant.helpers import entity_registry as er
@@ -20,6 +23,7 @@ from homeassistant.helpers.trigger import TriggerInfo
 from homeassistant.helpers.typing import ConfigType
 
 from . import DOMAIN
+from .const import EVENT_CONNECTEDROOM
 
 TRIGGER_TYPES = {"goal", "game_start", "game_end", "period_start", "period_end"}
 
@@ -38,15 +42,9 @@ async def async_get_triggers(
     registry = er.async_get(hass)
     triggers = []
 
-    # TODO Read this comment and remove it.
-    # This example shows how to iterate over the entities of this device
-    # that match this integration. If your triggers instead rely on
-    # events fired by devices without entities, do something like:
-    # zha_device = await _async_get_zha_device(hass, device_id)
-    # return zha_device.device_triggers
-
-    # Get all the integrations entities for this device
-    for entry in er.async_entries_for_device(registry, device_id):
+    # The events are fired for the device, list them once with its first
+    # entity rather than once per game sensor
+    for entry in er.async_entries_for_device(registry, device_id)[:1]:
         base_trigger = {
             CONF_PLATFORM: "device",
             CONF_DEVICE_ID: device_id,
@@ -66,16 +64,37 @@ async def async_attach_trigger(
     trigger_info: TriggerInfo,
 ) -> CALLBACK_TYPE:
     """Attach a trigger."""
-    event_config = event_trigger.TRIGGER_SCHEMA(
-        {
-            event_trigger.CONF_PLATFORM: "event",
-            event_trigger.CONF_EVENT_TYPE: "connectedroom_event",
-            event_trigger.CONF_EVENT_DATA: {
-                CONF_DEVICE_ID: config[CONF_DEVICE_ID],
-                CONF_TYPE: config[CONF_TYPE],
+    device_id = config[CONF_DEVICE_ID]
+    trigger_type = config[CONF_TYPE]
+    trigger_data = trigger_info["trigger_data"]
+    job = HassJob(action, f"connectedroom device trigger {trigger_info}")
+
+    @callback
+    def filter_event(event_data: Mapping[str, Any]) -> bool:
+        if event_data.get(CONF_TYPE) != trigger_type:
+            return False
+
+        # A single event for the entry lists all of its devices
+        if "device_ids" in event_data:
+            return device_id in event_data["device_ids"]
+
+        return event_data.get(CONF_DEVICE_ID) == device_id
+
+    @callback
+    def handle_event(event: Event) -> None:
+        hass.async_run_hass_job(
+            job,
+            {
+                "trigger": {
+                    **trigger_data,
+                    "platform": "device",
+                    "event": event,
+                    "description": f"event '{event.event_type}'",
+                }
             },
-        }
-    )
-    return await event_trigger.async_attach_trigger(
-        hass, event_config, action, trigger_info, platform_type="device"
+            event.context,
+        )
+
+    return hass.bus.async_listen(
+        EVENT_CONNECTEDROOM, handle_event, event_filter=filter_event
     )
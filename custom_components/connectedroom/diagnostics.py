@@ -0,0 +1,67 @@
+"""Diagnostics support for ConnectedRoom."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import BROADCAST_DELAY_TAG
+from .const import DOMAIN
+
+TO_REDACT = {"api_key", "websocket_key"}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    connectedroom = coordinator.connectedroom
+
+    pusher = connectedroom.pusher
+    connection = pusher.connection if pusher is not None else None
+    subscriptions = connectedroom.subscriptions
+
+    return {
+        "entry": {
+            "data": async_redact_data(entry.data, TO_REDACT),
+            "options": async_redact_data(entry.options, TO_REDACT),
+        },
+        "auth": async_redact_data(connectedroom.auth or {}, TO_REDACT),
+        "connection": {
+            "state": connection.state if connection is not None else None,
+            "do_not_reconnect": connectedroom.do_not_reconnect,
+            "reconnect_attempts": connectedroom.reconnect_attempts,
+        },
+        "subscriptions": {
+            name: sorted(subscriptions.bound_events(name))
+            for name in list(subscriptions.channels)
+        },
+        "traffic": {
+            name: connectedroom.hub.channel_traffic(name)
+            for name in list(subscriptions.channels)
+        },
+        "hub": connectedroom.hub.stats(),
+        "executor": connectedroom.executor.stats(),
+        "runtime": {
+            "is_playing_horn": connectedroom.is_playing_horn,
+            "stay_on_goal_horn": connectedroom.stay_on_goal_horn,
+            "tts_after_goal_horn": connectedroom.tts_after_goal_horn,
+            "goal_horn_listener": connectedroom.last_goal_horn_unsub is not None,
+            "light_snapshot": sorted(connectedroom.light_snapshot),
+            "broadcast_delay": connectedroom.broadcast_delay,
+            "goal_horn_durations": connectedroom.goal_horn_durations,
+            "speaker_warm_up": connectedroom.warm_up.active,
+            "recent_events": len(coordinator.recent_events),
+        },
+        "scheduler": connectedroom.scheduler.stats(BROADCAST_DELAY_TAG),
+        "event_queue": connectedroom.event_queue.stats(),
+        "outbound_queue": {
+            "pending": sorted(connectedroom.outbound.entries),
+            "dropped": connectedroom.outbound.dropped,
+        },
+        "handler_throughput": connectedroom.metrics.throughput("handler_duration."),
+        "metrics": connectedroom.metrics.as_dict(),
+    }
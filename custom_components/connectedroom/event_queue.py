@@ -0,0 +1,128 @@
+"""Priority queue between the websocket and the ConnectedRoom handlers."""
+from __future__ import annotations
+
+import contextvars
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from .const import EVENT_CLASSES
+from .tracing import TRACE_FILTER
+
+_LOGGER = logging.getLogger(__name__)
+_LOGGER.addFilter(TRACE_FILTER)
+
+
+class PriorityEventQueue:
+    """Run the handlers by event class priority on a single worker thread.
+
+    A goal waiting behind a burst of light commands runs first, and an event
+    older than the max age of its class is dropped instead of run late.
+    """
+
+    def __init__(self, run, name: str = "ConnectedRoomEvents", on_drop=None) -> None:
+        self.run = run
+        self.name = name
+        self.on_drop = on_drop
+        self._queue = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+        self.depth = dict.fromkeys(EVENT_CLASSES, 0)
+        self.handled = dict.fromkeys(EVENT_CLASSES, 0)
+        self.dropped = dict.fromkeys(EVENT_CLASSES, 0)
+
+    def put(self, event_class: str, handler, *args) -> None:
+        """Queue a handler, can be called from any thread."""
+        priority, _ = EVENT_CLASSES[event_class]
+
+        with self._condition:
+            if self._stopped:
+                return
+
+            heapq.heappush(
+                self._queue,
+                (
+                    priority,
+                    next(self._counter),
+                    time.monotonic(),
+                    event_class,
+                    contextvars.copy_context(),
+                    handler,
+                    args,
+                ),
+            )
+            self.depth[event_class] += 1
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=self.name, daemon=True
+                )
+                self._thread.start()
+
+            self._condition.notify()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._queue = []
+            self.depth = dict.fromkeys(EVENT_CLASSES, 0)
+            self._condition.notify()
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                event_class: {
+                    "depth": self.depth[event_class],
+                    "handled": self.handled[event_class],
+                    "dropped": self.dropped[event_class],
+                }
+                for event_class in EVENT_CLASSES
+            }
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._queue and not self._stopped:
+                    self._condition.wait()
+
+                if self._stopped:
+                    self._thread = None
+                    return
+
+                entry = heapq.heappop(self._queue)
+                _, _, queued_at, event_class, context, handler, args = entry
+                self.depth[event_class] -= 1
+
+                _, max_age = EVENT_CLASSES[event_class]
+                stale = max_age is not None and time.monotonic() - queued_at > max_age
+
+                if stale:
+                    self.dropped[event_class] += 1
+                else:
+                    self.handled[event_class] += 1
+
+            if stale:
+                context.run(
+                    _LOGGER.debug,
+                    "Dropping stale %s %s",
+                    event_class,
+                    handler.__name__,
+                )
+
+                if self.on_drop is not None:
+                    self.on_drop(event_class)
+
+                continue
+
+            try:
+                # In the context it was queued from, with its trace
+                context.run(self.run, handler, *args)
+            except Exception:  # pylint: disable=broad-except
+                context.run(
+                    _LOGGER.exception, "Error while handling %s", handler.__name__
+                )
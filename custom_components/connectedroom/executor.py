@@ -0,0 +1,133 @@
+"""Bounded executor for the blocking work of ConnectedRoom."""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import callback
+from homeassistant.core import HomeAssistant
+
+from .const import DATA_EXECUTOR
+from .metrics import MetricsRegistry
+
+_LOGGER = logging.getLogger(__name__)
+
+MAX_WORKERS = 4
+MAX_QUEUE = 64
+
+
+class ExecutorFull(RuntimeError):
+    """Error to indicate too many jobs are already waiting."""
+
+
+def get_executor(hass: HomeAssistant) -> BoundedExecutor:
+    executor = hass.data.get(DATA_EXECUTOR)
+
+    if executor is None:
+        executor = hass.data[DATA_EXECUTOR] = BoundedExecutor()
+
+        @callback
+        def shutdown(event) -> None:
+            executor.shutdown()
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, shutdown)
+
+    return executor
+
+
+class BoundedExecutor:
+    """Run blocking jobs on a few worker threads with a bounded queue.
+
+    The entries share it, so ConnectedRoom never takes more than MAX_WORKERS
+    threads, whatever the number of entries or the load of Home Assistant's
+    own executor. A job submitted while MAX_QUEUE jobs are waiting is
+    rejected with ExecutorFull.
+    """
+
+    def __init__(
+        self, max_workers: int = MAX_WORKERS, max_queue: int = MAX_QUEUE
+    ) -> None:
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.metrics = MetricsRegistry()
+        self.queued = 0
+        self.active = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ConnectedRoomWorker"
+        )
+
+    def submit(self, func, *args) -> Future:
+        """Queue a job, can be called from any thread."""
+        name = getattr(func, "__name__", "job")
+
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.metrics.inc("executor.rejected")
+                raise ExecutorFull(f"{self.queued} jobs already waiting")
+
+            self.queued += 1
+            self._set_gauges()
+
+        self.metrics.inc("executor.submitted." + name)
+
+        # The job keeps the trace of the event that submitted it
+        return self._pool.submit(
+            contextvars.copy_context().run,
+            self._run,
+            func,
+            args,
+            name,
+            time.monotonic(),
+        )
+
+    async def async_run(self, func, *args):
+        """Run a job and wait for its result in the running event loop."""
+        return await asyncio.wrap_future(self.submit(func, *args))
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self.queued,
+                "active_workers": self.active,
+                **self.metrics.as_dict(),
+            }
+
+    def _run(self, func, args, name, submitted):
+        started = time.monotonic()
+
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+            self._set_gauges()
+
+        self.metrics.observe("executor.wait_seconds", started - submitted)
+
+        try:
+            return func(*args)
+        except Exception:
+            self.metrics.inc("executor.failed." + name)
+            raise
+        finally:
+            self.metrics.observe(
+                "executor.run_seconds." + name, time.monotonic() - started
+            )
+
+            with self._lock:
+                self.active -= 1
+                self._set_gauges()
+
+    def _set_gauges(self) -> None:
+        self.metrics.set("executor.queue_depth", self.queued)
+        self.metrics.set("executor.active_workers", self.active)
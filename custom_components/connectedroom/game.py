@@ -0,0 +1,166 @@
+"""State of the current game, built from the ConnectedRoom events."""
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any
+
+# An event seen again within this many seconds is a duplicate
+DUPLICATE_WINDOW = 600
+MAX_RECENT_EVENTS = 50
+
+# Not worth keeping across restarts
+UNPERSISTED_FIELDS = ("natural_text", "payload")
+
+GAME_STATUSES = {
+    "game_start": "in_progress",
+    "period_start": "in_progress",
+    "period_end": "intermission",
+    "game_end": "final",
+}
+
+
+def event_key(event_type: str, data) -> str | None:
+    """Identify an event, by its id or else by its timestamp and content.
+
+    None when the event has neither, two goals can have the same content.
+    """
+    if isinstance(data, dict) and data.get("id") is not None:
+        return f"{event_type}:{data['id']}"
+
+    timestamp = event_timestamp(data)
+
+    if timestamp is None:
+        return None
+
+    content = json.dumps(data, sort_keys=True, default=str)
+    digest = hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+    return f"{event_type}:{timestamp}:{digest}"
+
+
+def event_timestamp(data) -> float | None:
+    """Return when an event was published, as a Unix timestamp."""
+    if not isinstance(data, dict):
+        return None
+
+    value = data.get("timestamp", data.get("created_at"))
+
+    if isinstance(value, (int, float)):
+        # Milliseconds are common in JavaScript backends
+        return value / 1000 if value > 1e11 else float(value)
+
+    if isinstance(value, str):
+        try:
+            return datetime.datetime.fromisoformat(
+                value.replace("Z", "+00:00")
+            ).timestamp()
+        except ValueError:
+            return None
+
+    return None
+
+
+def _name(value) -> str | None:
+    if isinstance(value, dict):
+        value = value.get("name") or value.get("full_name")
+
+    return str(value) if value is not None else None
+
+
+def _score(value) -> int | None:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class GameState:
+    """Score, period and status of the current game.
+
+    The events do not all carry the same fields, a field missing from an
+    event keeps its previous value.
+    """
+
+    status: str | None = None
+    period: int | str | None = None
+    home_team: str | None = None
+    home_score: int | None = None
+    away_team: str | None = None
+    away_score: int | None = None
+    last_scorer: str | None = None
+    last_scorer_team: str | None = None
+    last_event: str | None = None
+    natural_text: str | None = None
+    payload: Any = None
+    updated_at: str | None = None
+
+    def update(self, event_type: str, data: dict, payload: Any = None) -> None:
+        if event_type == "game_start":
+            # Nothing of the previous game is carried over
+            for field in dataclasses.fields(self):
+                setattr(self, field.name, field.default)
+
+        self.status = GAME_STATUSES.get(event_type, self.status)
+        self.last_event = event_type
+        self.natural_text = data.get("natural_text")
+        self.payload = payload
+        self.updated_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+        period = data.get("period")
+
+        if isinstance(period, dict):
+            period = period.get("number", period.get("name"))
+
+        if period is not None:
+            self.period = period
+
+        # The score is either at the root of the payload or in its game
+        game = data.get("game") if isinstance(data.get("game"), dict) else data
+
+        for side in ("home", "away"):
+            team = game.get(side + "_team")
+            name = _name(team)
+            score = _score(game.get(side + "_score"))
+
+            if isinstance(team, dict) and _score(team.get("score")) is not None:
+                score = _score(team.get("score"))
+
+            if name is not None:
+                setattr(self, side + "_team", name)
+
+            if score is not None:
+                setattr(self, side + "_score", score)
+            elif event_type == "game_start":
+                setattr(self, side + "_score", 0)
+
+        if event_type == "goal":
+            scorer = _name(data.get("scorer") or data.get("player"))
+
+            if scorer is not None:
+                self.last_scorer = scorer
+
+            self.last_scorer_team = _name(data.get("team"))
+
+    def as_dict(self) -> dict[str, Any]:
+        return dataclasses.asdict(self)
+
+    def as_stored(self) -> dict[str, Any]:
+        data = self.as_dict()
+
+        for field in UNPERSISTED_FIELDS:
+            del data[field]
+
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict | None) -> GameState:
+        names = {field.name for field in dataclasses.fields(cls)}
+
+        return cls(
+            **{key: value for key, value in (data or {}).items() if key in names}
+        )
@@ -0,0 +1,361 @@
+"""Websocket connection shared by the ConnectedRoom entries."""
+from __future__ import annotations
+
+import logging
+import threading
+
+import httpx
+import pysher
+from homeassistant.core import HomeAssistant
+from pysher.channel import Channel
+
+from .const import API_URL
+from .const import DATA_HUB
+from .const import WSS_HOST
+from .const import WSS_KEY
+from .executor import ExecutorFull
+from .executor import get_executor
+
+_LOGGER = logging.getLogger(__name__)
+
+AUTH_ENDPOINT = API_URL + "/auth/websockets"
+AUTH_TIMEOUT = 10
+
+
+def get_hub(hass: HomeAssistant) -> ConnectionHub:
+    hub = hass.data.get(DATA_HUB)
+
+    if hub is None:
+        hub = hass.data[DATA_HUB] = ConnectionHub(get_executor(hass))
+
+    return hub
+
+
+class ConnectionHub:
+    """Multiplex the channels of every entry over one pusher connection.
+
+    The connection is opened by the first entry and closed with the last one.
+    Channels are reference counted and authenticated with the websocket key
+    of the entry that subscribed them, pusher routes their events to the
+    bindings of that entry. Entries are told about connections once their
+    channels are bound, see ready().
+    """
+
+    def __init__(self, executor) -> None:
+        self.executor = executor
+        self.pusher = None
+        self.rooms = []
+        self._ready = []
+        self.channels: dict[str, Channel] = {}
+        self._users: dict[str, int] = {}
+        self._websocket_keys: dict[str, str] = {}
+        # Channels to subscribe once the executor takes jobs again
+        self._pending: dict[str, Channel] = {}
+        self._lock = threading.RLock()
+        # Received messages and bytes per channel, "connection" for the
+        # protocol events
+        self.traffic: dict[str, dict[str, int]] = {}
+
+    def acquire(self, connected_room) -> pysher.Pusher:
+        with self._lock:
+            if connected_room not in self.rooms:
+                self.rooms.append(connected_room)
+
+            if self.pusher is None:
+                self.pusher = self._create_pusher()
+                self.pusher.connect()
+
+            return self.pusher
+
+    def ready(self, connected_room) -> None:
+        """Notify an entry of the connections, once its channels are bound."""
+        with self._lock:
+            if connected_room not in self.rooms or connected_room in self._ready:
+                return
+
+            self._ready.append(connected_room)
+
+            connected = (
+                self.pusher is not None and self.pusher.connection.state == "connected"
+            )
+
+        # Already connected, catch up now instead of on the next connection
+        if connected:
+            connected_room.on_connected()
+
+    def release(self, connected_room) -> None:
+        with self._lock:
+            if connected_room in self.rooms:
+                self.rooms.remove(connected_room)
+
+            if connected_room in self._ready:
+                self._ready.remove(connected_room)
+
+            if self.rooms or self.pusher is None:
+                return
+
+            pusher, self.pusher = self.pusher, None
+
+        if pusher.connection and pusher.connection.state != "disconnected":
+            pusher.disconnect()
+
+    def subscribe(self, channel_name: str, websocket_key: str) -> Channel:
+        with self._lock:
+            channel = self.channels.get(channel_name)
+
+            self._users[channel_name] = self._users.get(channel_name, 0) + 1
+            self._websocket_keys[channel_name] = websocket_key
+
+            if channel is None:
+                channel = Channel(channel_name, self.pusher.connection)
+                self.channels[channel_name] = channel
+
+                if self.pusher.connection.state == "connected":
+                    self._subscribe_later(channel)
+
+            return channel
+
+    def unsubscribe(self, channel_name: str) -> bool:
+        """Release a channel, return True when it was the last user."""
+        with self._lock:
+            users = self._users.get(channel_name, 0) - 1
+
+            if users > 0:
+                self._users[channel_name] = users
+                return False
+
+            channel = self.channels.pop(channel_name, None)
+            self._pending.pop(channel_name, None)
+            self._users.pop(channel_name, None)
+            self._websocket_keys.pop(channel_name, None)
+
+            if channel is None:
+                return False
+
+            channel.event_callbacks.clear()
+
+            pusher = self.pusher
+
+            if pusher is not None:
+                pusher.channels.pop(channel_name, None)
+
+                if pusher.connection.state == "connected":
+                    pusher.connection.send_event(
+                        "pusher:unsubscribe", {"channel": channel_name}
+                    )
+
+            return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self.rooms),
+                "channels": dict(self._users),
+                "compression": "none",
+                "traffic": {
+                    name: dict(counters) for name, counters in self.traffic.items()
+                },
+            }
+
+    def channel_traffic(self, channel_name: str) -> dict[str, int]:
+        with self._lock:
+            return dict(self.traffic.get(channel_name, {"messages": 0, "bytes": 0}))
+
+    def _create_pusher(self) -> pysher.Pusher:
+        pusher = pysher.Pusher(
+            key=WSS_KEY,
+            custom_host=WSS_HOST,
+            reconnect_interval=15,
+            log_level=logging.CRITICAL,
+            # Passed to the connection thread, the profiler follows it by name
+            name="PysherEventLoop",
+        )
+
+        pusher.connection.ping_interval = 15
+
+        # _on_connected subscribes the channels again with a token of the new
+        # socket, pysher must not send them first with the stale one
+        pusher.connection.reconnect_handler = lambda: None
+
+        # websocket-client has no permessage-deflate, it does not offer the
+        # extension and the server falls back to uncompressed frames. Count
+        # what is received instead, every message goes through _parse.
+        parse = pusher.connection._parse
+
+        def parse_and_count(message):
+            params = parse(message)
+            self._count(params.get("channel") or "connection", message)
+
+            # At least a pong every ping_interval, the executor may have room
+            if self._pending:
+                self._subscribe_pending()
+
+            return params
+
+        pusher.connection._parse = parse_and_count
+
+        # Reconnects are asked by a pusher:error or a missed pong, a socket
+        # error makes the connection thread reconnect on its own
+        reconnect = pusher.connection.reconnect
+        on_socket_error = pusher.connection._on_error
+
+        def reconnect_and_count(*args, **kwargs):
+            self._on_reconnect()
+
+            return reconnect(*args, **kwargs)
+
+        def on_socket_error_and_count(*args):
+            self._on_reconnect()
+
+            return on_socket_error(*args)
+
+        pusher.connection.reconnect = reconnect_and_count
+        pusher.connection._on_error = on_socket_error_and_count
+
+        pusher.connection.bind("pusher:connection_established", self._on_connected)
+
+        pusher.connection.event_callbacks.pop("pusher:error")
+
+        pusher.connection.bind("pusher:error", self._on_error)
+
+        return pusher
+
+    def _on_connected(self, data) -> None:
+        with self._lock:
+            self._pending.clear()
+
+            # Subscribe the existing channels again on the new connection
+            for channel in self.channels.values():
+                self._send_subscribe(channel)
+
+            rooms = list(self._ready)
+
+        for connected_room in rooms:
+            connected_room.on_connected()
+
+    def _on_reconnect(self) -> None:
+        with self._lock:
+            rooms = list(self.rooms)
+
+        for connected_room in rooms:
+            connected_room.reconnect_attempts += 1
+            connected_room.metrics.inc("connection.reconnects")
+
+    def _on_error(self, data) -> None:
+        with self._lock:
+            pusher = self.pusher
+            rooms = list(self.rooms)
+
+        for connected_room in rooms:
+            connected_room.metrics.inc("connection.errors")
+
+        if pusher is None:
+            return
+
+        if "code" in data:
+            try:
+                error_code = int(data["code"])
+            except ValueError:
+                error_code = None
+
+            if error_code is not None:
+                pusher.connection.logger.error(
+                    "Connection: Received error %s" % error_code
+                )
+
+                if (error_code >= 4200) and (error_code <= 4299):
+                    # The connection SHOULD be re-established immediately
+                    pusher.connection.reconnect(5)
+                else:
+                    pusher.connection.reconnect()
+            else:
+                pusher.connection.logger.error("Connection: Unknown error code")
+        else:
+            pusher.connection.logger.error("Connection: No error code supplied")
+
+    def _count(self, name: str, message) -> None:
+        size = len(message.encode("utf-8") if isinstance(message, str) else message)
+
+        with self._lock:
+            counters = self.traffic.setdefault(name, {"messages": 0, "bytes": 0})
+            counters["messages"] += 1
+            counters["bytes"] += size
+
+    def _subscribe_later(self, channel: Channel) -> None:
+        """Subscribe on the live connection, off the caller's thread.
+
+        Private channels are authenticated with a blocking request, entries
+        subscribe from the event loop.
+        """
+        with self._lock:
+            self._pending[channel.name] = channel
+            self._subscribe_pending()
+
+            if channel.name not in self._pending:
+                return
+
+            rooms = list(self.rooms)
+
+        for connected_room in rooms:
+            connected_room.metrics.inc("connection.subscribes_deferred")
+
+    def _subscribe_pending(self) -> None:
+        """Hand the waiting channels to the executor while it takes them.
+
+        Those it rejects are tried again on the next message received, or
+        subscribed with the others on the next connection.
+        """
+        with self._lock:
+            while self._pending:
+                channel = next(iter(self._pending.values()))
+
+                try:
+                    self.executor.submit(self._send_subscribe, channel)
+                except ExecutorFull:
+                    return
+
+                del self._pending[channel.name]
+
+    def _send_subscribe(self, channel: Channel) -> None:
+        pusher = self.pusher
+
+        # Unsubscribed meanwhile
+        if self.channels.get(channel.name) is not channel:
+            return
+
+        if pusher is None or pusher.connection.state != "connected":
+            # Sent once the connection is established
+            return
+
+        data = {"channel": channel.name}
+
+        if channel.name.startswith("private-"):
+            # The token is signed for the socket id, renew it every connection
+            try:
+                channel.auth = self._authenticate(
+                    channel.name, self._websocket_keys[channel.name]
+                )
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Unable to authenticate channel %s", channel.name)
+                return
+
+            data["auth"] = channel.auth
+
+        channel.connection = pusher.connection
+        pusher.channels[channel.name] = channel
+        pusher.connection.send_event("pusher:subscribe", data)
+
+    def _authenticate(self, channel_name: str, websocket_key: str) -> str:
+        response = httpx.post(
+            AUTH_ENDPOINT,
+            data={
+                "channel_name": channel_name,
+                "socket_id": self.pusher.connection.socket_id,
+            },
+            headers={"x-websocket-key": websocket_key},
+            timeout=AUTH_TIMEOUT,
+            verify=False,
+        )
+        response.raise_for_status()
+
+        return response.json()["auth"]
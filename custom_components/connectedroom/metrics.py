@@ -0,0 +1,100 @@
+"""In-process metrics for the ConnectedRoom integration."""
+from __future__ import annotations
+
+import itertools
+import threading
+
+
+class Histogram:
+    """Count, sum, min and max of observed values with fixed buckets."""
+
+    BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 60)
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.last = None
+        self.buckets = [0] * (len(self.BUCKETS) + 1)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.last = value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+        for index, bound in enumerate(self.BUCKETS):
+            if value <= bound:
+                self.buckets[index] += 1
+                return
+
+        self.buckets[-1] += 1
+
+    def as_dict(self) -> dict:
+        # Buckets are reported cumulative, like Prometheus "le" buckets
+        cumulative = list(itertools.accumulate(self.buckets))
+
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "last": self.last,
+            "buckets": {
+                **{
+                    f"le_{bound}": count
+                    for bound, count in zip(self.BUCKETS, cumulative)
+                },
+                "le_inf": cumulative[-1],
+            },
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe registry of counters, gauges and histograms."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def inc(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name: str, value) -> None:
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            histogram = self.histograms.get(name)
+
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+
+            histogram.observe(value)
+
+    def throughput(self, prefix: str) -> dict:
+        """Return the events per second each timed handler can sustain."""
+        with self._lock:
+            return {
+                name[len(prefix) :]: round(histogram.count / histogram.total, 1)
+                for name, histogram in self.histograms.items()
+                if name.startswith(prefix) and histogram.total > 0
+            }
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "histograms": {
+                    name: histogram.as_dict()
+                    for name, histogram in self.histograms.items()
+                },
+            }
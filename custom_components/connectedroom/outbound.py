@@ -0,0 +1,164 @@
+"""Persistent queue of the requests ConnectedRoom could not deliver."""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+from homeassistant.core import callback
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+from .executor import ExecutorFull
+from .executor import get_executor
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 5
+
+MAX_ENTRIES = 200
+RETRY_MIN_DELAY = 5
+RETRY_MAX_DELAY = 600
+
+
+class OutboundQueue:
+    """Keep failed API requests and send them again with a backoff.
+
+    Entries are keyed, a new entry replaces a pending one with the same key so
+    only the latest device sync and the latest state of each entity are sent.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str, send) -> None:
+        self.hass = hass
+        self.send = send
+        self.entries: dict[str, dict] = {}
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._flushing = False
+        self._cancel_retry = None
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.outbound")
+
+    async def async_load(self) -> None:
+        data = await self._store.async_load()
+
+        if not data:
+            return
+
+        with self._lock:
+            for entry in data.get("entries", []):
+                self.entries.setdefault(entry["key"], entry)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def enqueue(self, key: str, path: str, payload: dict) -> None:
+        """Queue a request that just failed, can be called from any thread."""
+        with self._lock:
+            previous = self.entries.pop(key, None)
+
+            self.entries[key] = {
+                "key": key,
+                "path": path,
+                "payload": payload,
+                "attempts": previous["attempts"] if previous else 1,
+                "next_attempt": previous["next_attempt"]
+                if previous
+                else time.time() + RETRY_MIN_DELAY,
+            }
+
+            while len(self.entries) > MAX_ENTRIES:
+                del self.entries[next(iter(self.entries))]
+                self.dropped += 1
+
+        self.hass.loop.call_soon_threadsafe(self._async_schedule_retry)
+
+    def flush(self, force: bool = False) -> None:
+        """Send the due entries, blocking, run it in an executor."""
+        with self._lock:
+            if self._flushing:
+                return
+
+            self._flushing = True
+            now = time.time()
+            due = [
+                entry
+                for entry in self.entries.values()
+                if force or entry["next_attempt"] <= now
+            ]
+
+        try:
+            for index, entry in enumerate(due):
+                try:
+                    self.send(entry["path"], entry["payload"])
+                except ConnectionError:
+                    with self._lock:
+                        # The connection is down, retry the remaining ones later
+                        for pending in due[index:]:
+                            pending["attempts"] += 1
+                            pending["next_attempt"] = time.time() + min(
+                                RETRY_MIN_DELAY * 2 ** (pending["attempts"] - 1),
+                                RETRY_MAX_DELAY,
+                            )
+                    break
+                except Exception:  # pylint: disable=broad-except
+                    _LOGGER.warning("Dropping rejected request %s", entry["key"])
+                    self._remove(entry)
+                else:
+                    self._remove(entry)
+        finally:
+            with self._lock:
+                self._flushing = False
+
+        self.hass.loop.call_soon_threadsafe(self._async_schedule_retry)
+
+    async def async_flush(self, force: bool = False) -> None:
+        if self.entries:
+            try:
+                await get_executor(self.hass).async_run(self.flush, force)
+            except ExecutorFull:
+                _LOGGER.debug("Executor busy, flushing the outbound queue later")
+
+    async def async_stop(self) -> None:
+        if self._cancel_retry is not None:
+            self._cancel_retry()
+            self._cancel_retry = None
+
+        await self._store.async_save(self._data_to_save())
+
+    def _remove(self, entry: dict) -> None:
+        with self._lock:
+            # Only when it was not replaced by a newer entry meanwhile
+            if self.entries.get(entry["key"]) is entry:
+                del self.entries[entry["key"]]
+
+    @callback
+    def _async_schedule_retry(self) -> None:
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+        if self._cancel_retry is not None:
+            self._cancel_retry()
+            self._cancel_retry = None
+
+        with self._lock:
+            if not self.entries:
+                return
+
+            delay = max(
+                min(entry["next_attempt"] for entry in self.entries.values())
+                - time.time(),
+                0,
+            )
+
+        self._cancel_retry = async_call_later(self.hass, delay, self._async_retry)
+
+    async def _async_retry(self, _now) -> None:
+        self._cancel_retry = None
+
+        await self.async_flush()
+
+    def _data_to_save(self) -> dict:
+        with self._lock:
+            return {"entries": list(self.entries.values())}
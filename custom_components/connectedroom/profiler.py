@@ -0,0 +1,161 @@
+"""Sampling profiler for live ConnectedRoom sessions."""
+from __future__ import annotations
+
+import datetime
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from pysher.connection import Connection
+
+_LOGGER = logging.getLogger(__name__)
+
+INTEGRATION_PATH = os.path.dirname(os.path.abspath(__file__))
+
+# Threads that always belong to the integration, even outside of its files.
+# The pysher connection threads are also matched by type, whatever their name.
+PROFILED_THREADS = ("PysherEventLoop", "PysherScheduler", "ConnectedRoom")
+
+
+class SamplingProfiler:
+    """Sample the integration's stacks for a bounded duration."""
+
+    def __init__(self, output_dir: str) -> None:
+        self.output_dir = output_dir
+        self.samples = Counter()
+        self.sample_count = 0
+        self.started_at = None
+        self.duration = 0.0
+        self.interval = 0.01
+        self.trace_memory = False
+        self.last_output = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._started_tracemalloc = False
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(
+        self, duration: float, interval: float = 0.01, trace_memory: bool = False
+    ) -> bool:
+        if self.running:
+            return False
+
+        self.samples = Counter()
+        self.sample_count = 0
+        self.started_at = datetime.datetime.now()
+        self.duration = duration
+        self.interval = interval
+        self.trace_memory = trace_memory
+        self._stop_event.clear()
+
+        self._started_tracemalloc = False
+
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            self._started_tracemalloc = True
+
+        self._thread = threading.Thread(
+            target=self._run, name="ConnectedRoomProfiler", daemon=True
+        )
+        self._thread.start()
+
+        return True
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def _run(self) -> None:
+        deadline = time.monotonic() + self.duration
+        own_thread = threading.get_ident()
+
+        while not self._stop_event.is_set() and time.monotonic() < deadline:
+            threads = {thread.ident: thread for thread in threading.enumerate()}
+
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+
+                stack = self._collapse(threads.get(thread_id), thread_id, frame)
+
+                if stack is not None:
+                    self.samples[stack] += 1
+
+            self.sample_count += 1
+            self._stop_event.wait(self.interval)
+
+        try:
+            self._write()
+        except OSError:
+            _LOGGER.exception("Unable to write the ConnectedRoom profile")
+        finally:
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+
+    def _collapse(self, thread, thread_id: int, frame) -> str | None:
+        frames = []
+        thread_name = thread.name if thread is not None else str(thread_id)
+        relevant = isinstance(thread, Connection) or thread_name.startswith(
+            PROFILED_THREADS
+        )
+
+        while frame is not None:
+            code = frame.f_code
+
+            if code.co_filename.startswith(INTEGRATION_PATH):
+                relevant = True
+
+            frames.append(
+                f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+            )
+            frame = frame.f_back
+
+        if not relevant:
+            return None
+
+        return ";".join([thread_name, *reversed(frames)])
+
+    def _write(self) -> None:
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        name = "profile_" + self.started_at.strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(self.output_dir, name + ".txt")
+
+        # Collapsed stacks, ready for flamegraph.pl or speedscope
+        with open(path, "w", encoding="utf-8") as file:
+            for stack, count in self.samples.most_common():
+                file.write(f"{stack} {count}\n")
+
+        if self.trace_memory and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                (
+                    tracemalloc.Filter(True, INTEGRATION_PATH + os.sep + "*"),
+                    tracemalloc.Filter(True, "*" + os.sep + "pysher" + os.sep + "*"),
+                )
+            )
+
+            with open(
+                os.path.join(self.output_dir, name + ".tracemalloc.txt"),
+                "w",
+                encoding="utf-8",
+            ) as file:
+                for stat in snapshot.statistics("traceback")[:50]:
+                    file.write(f"{stat}\n")
+
+                    for line in stat.traceback.format():
+                        file.write(f"    {line}\n")
+
+        self.last_output = path
+
+        _LOGGER.info(
+            "ConnectedRoom profile written to %s (%s samples)",
+            path,
+            self.sample_count,
+        )
@@ -0,0 +1,109 @@
+"""Options of a ConnectedRoom entry compiled for the event path."""
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any
+
+LIGHT_COLORS = ("primary", "secondary", "alternate")
+
+
+def _entity_ids(value) -> tuple[str, ...]:
+    if not value:
+        return ()
+
+    if isinstance(value, str):
+        return (value,)
+
+    return tuple(value)
+
+
+@dataclass(frozen=True, slots=True)
+class RuntimeConfig:
+    """Immutable snapshot of the options, rebuilt when the options change."""
+
+    goal_horn_devices: tuple[str, ...]
+    tts_devices: tuple[str, ...]
+    tts_provider: str | None
+    tts_service: str | None
+    # Synthesize once and play the same file on every speaker
+    tts_single_synthesis: bool
+    # Keep the goal horn and TTS players awake during a game
+    speaker_warm_up: bool
+    light_targets: Mapping[str, Mapping[str, Any]]
+    # Target of the devices controlled from ConnectedRoom, see targets.py
+    device_target: Mapping[str, Any]
+    broadcast_delay: float
+    # Fire one connectedroom_event per game event instead of one per device
+    single_event: bool
+    # Payload fields kept in connectedroom_event, empty keeps the whole payload
+    event_payload_fields: tuple[str, ...]
+    # (service, service_data) of every TTS call, without the message
+    tts_calls: tuple[tuple[str, Mapping[str, Any]], ...]
+
+    @classmethod
+    def from_options(cls, options: Mapping[str, Any]) -> RuntimeConfig:
+        tts_devices = _entity_ids(options.get("tts_devices"))
+        tts_provider = options.get("tts_provider") or None
+        tts_service = options.get("tts_service") or None
+
+        tts_calls = ()
+
+        if tts_service:
+            tts_calls = tuple(
+                (tts_service, MappingProxyType({"cache": True, "entity_id": device}))
+                for device in tts_devices
+            )
+        elif tts_provider:
+            tts_calls = tuple(
+                (
+                    "speak",
+                    MappingProxyType(
+                        {
+                            "cache": True,
+                            "media_player_entity_id": device,
+                            "entity_id": tts_provider,
+                        }
+                    ),
+                )
+                for device in tts_devices
+            )
+
+        light_targets = {}
+
+        for color in LIGHT_COLORS:
+            lights = options.get(color + "_lights")
+
+            if lights:
+                light_targets[color] = MappingProxyType(
+                    dict(lights)
+                    if isinstance(lights, Mapping)
+                    else {"entity_id": lights}
+                )
+
+        devices = options.get("devices") or {}
+
+        return cls(
+            goal_horn_devices=_entity_ids(options.get("goal_horn_devices")),
+            tts_devices=tts_devices,
+            tts_provider=tts_provider,
+            tts_service=tts_service,
+            tts_single_synthesis=bool(
+                options.get("tts_single_synthesis")
+                and tts_provider
+                and not tts_service
+                and len(tts_devices) > 1
+            ),
+            speaker_warm_up=bool(options.get("speaker_warm_up")),
+            light_targets=MappingProxyType(light_targets),
+            device_target=MappingProxyType(dict(devices)),
+            broadcast_delay=float(options.get("broadcast_delay") or 0),
+            single_event=bool(options.get("single_event")),
+            event_payload_fields=_entity_ids(options.get("event_payload_fields")),
+            tts_calls=tts_calls,
+        )
+
+    def tts_service_calls(self, message: str):
+        for service, service_data in self.tts_calls:
+            yield service, {**service_data, "message": message}
@@ -0,0 +1,141 @@
+"""Deadline scheduler used to delay ConnectedRoom actions."""
+from __future__ import annotations
+
+import contextvars
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from .tracing import TRACE_FILTER
+
+_LOGGER = logging.getLogger(__name__)
+_LOGGER.addFilter(TRACE_FILTER)
+
+
+class DeadlineScheduler:
+    """Run callbacks at monotonic deadlines on a single worker thread.
+
+    The lateness is kept by tag, the broadcast delay is measured apart from
+    the warm-up and TTS timers.
+    """
+
+    def __init__(self, name: str = "ConnectedRoomScheduler", on_run=None) -> None:
+        self.name = name
+        self.on_run = on_run
+        self._queue = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+        self.runs = 0
+        self.cancelled = 0
+        # tag: [runs, last, max, total]
+        self._lateness: dict[str | None, list] = {}
+
+    def schedule(self, delay: float, callback, tag: str | None = None) -> None:
+        deadline = time.monotonic() + max(delay, 0.0)
+
+        with self._condition:
+            if self._stopped:
+                return
+
+            # Run in the context it was scheduled from, with its trace
+            heapq.heappush(
+                self._queue,
+                (
+                    deadline,
+                    next(self._counter),
+                    tag,
+                    callback,
+                    contextvars.copy_context(),
+                ),
+            )
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=self.name, daemon=True
+                )
+                self._thread.start()
+
+            self._condition.notify()
+
+    def cancel(self, tag: str | None = None) -> int:
+        with self._condition:
+            kept = [
+                entry for entry in self._queue if tag is not None and entry[2] != tag
+            ]
+            cancelled = len(self._queue) - len(kept)
+
+            heapq.heapify(kept)
+            self._queue = kept
+            self.cancelled += cancelled
+
+            self._condition.notify()
+
+        return cancelled
+
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._queue)
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._queue = []
+            self._condition.notify()
+
+    def stats(self, tag: str | None = None) -> dict:
+        """Counts of the scheduler, with the lateness of the runs of a tag."""
+        with self._condition:
+            runs, last, maximum, total = self._lateness.get(tag, (0, None, 0.0, 0.0))
+
+            return {
+                "pending": len(self._queue),
+                "runs": self.runs,
+                "cancelled": self.cancelled,
+                "tag_runs": runs,
+                "last_lateness_ms": None if last is None else round(last * 1000, 1),
+                "max_lateness_ms": round(maximum * 1000, 1),
+                "mean_lateness_ms": round(total / runs * 1000, 1) if runs else None,
+            }
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    if not self._queue:
+                        self._condition.wait()
+                        continue
+
+                    timeout = self._queue[0][0] - time.monotonic()
+
+                    if timeout <= 0:
+                        break
+
+                    self._condition.wait(timeout)
+
+                if self._stopped:
+                    self._thread = None
+                    return
+
+                deadline, _, tag, callback, context = heapq.heappop(self._queue)
+
+                lateness = time.monotonic() - deadline
+
+                self.runs += 1
+                stats = self._lateness.setdefault(tag, [0, None, 0.0, 0.0])
+                stats[0] += 1
+                stats[1] = lateness
+                stats[2] = max(stats[2], lateness)
+                stats[3] += lateness
+
+            try:
+                context.run(callback)
+            except Exception:  # pylint: disable=broad-except
+                context.run(_LOGGER.exception, "Error while running scheduled action")
+
+            if self.on_run is not None:
+                self.on_run(tag, lateness)
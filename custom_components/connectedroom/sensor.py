@@ -5,25 +5,53 @@
 # to display it in the UI (for know types). The unit_of_measurement property tells HA
 # what the unit is, so it can display the correct range. For predefined types (such as
 # battery), the unit_of_measurement should match what's expected.
-from homeassistant.helpers.entity import Entity
+from homeassistant.components.sensor import SensorDeviceClass
+from homeassistant.components.sensor import SensorEntity
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
+from .const import BROADCAST_DELAY_TAG
 from .const import DOMAIN
+from .game import GAME_STATUSES
 
 
 async def async_setup_entry(hass, config_entry, async_add_entities):
-    async_add_entities([ConnectedRoomSensor(config_entry)])
+    coordinator = hass.data[DOMAIN][config_entry.entry_id]
+
+    async_add_entities(
+        [
+            ConnectedRoomSensor(coordinator, config_entry),
+            ConnectedRoomScoreSensor(coordinator, config_entry, "home"),
+            ConnectedRoomScoreSensor(coordinator, config_entry, "away"),
+            ConnectedRoomPeriodSensor(coordinator, config_entry),
+            ConnectedRoomGameStatusSensor(coordinator, config_entry),
+            ConnectedRoomLastScorerSensor(coordinator, config_entry),
+        ]
+    )
 
 
 # This base class shows the common properties and methods for a sensor as used in this
 # example. See each sensor for further details about properties and methods that
 # have been overridden.
-class ConnectedRoomSensor(Entity):
+class ConnectedRoomSensor(CoordinatorEntity):
     """Base representation of a Hello World Sensor."""
 
     should_poll = False
 
-    def __init__(self, device):
+    # Change on every delayed event, kept out of the history
+    _unrecorded_attributes = frozenset(
+        {
+            "delayed_events_pending",
+            "delayed_events_played",
+            "delay_last_lateness_ms",
+            "delay_mean_lateness_ms",
+            "delay_max_lateness_ms",
+        }
+    )
+
+    def __init__(self, coordinator, device):
         """Initialize the sensor."""
+        super().__init__(coordinator)
+
         self._unique_id = device.data["unique_id"]
         self._api_key = device.data["api_key"]
 
@@ -50,5 +78,121 @@ class ConnectedRoomSensor(Entity):
     # If an entity is offline (return False), the UI will refelect this.
     @property
     def available(self) -> bool:
-        """Return True if roller and hub is available."""
-        return True
+        """Return True once ConnectedRoom is connected and the devices synced."""
+        return self.coordinator.data["ready"]
+
+    # The broadcast delay and how precisely the delayed events were played.
+    @property
+    def extra_state_attributes(self):
+        """Return the broadcast delay state."""
+        connectedroom = self.coordinator.connectedroom
+        scheduler = connectedroom.scheduler.stats(BROADCAST_DELAY_TAG)
+
+        return {
+            "broadcast_delay": connectedroom.broadcast_delay,
+            "delayed_events_pending": scheduler["pending"],
+            "delayed_events_played": scheduler["tag_runs"],
+            "delayed_events_cancelled": scheduler["cancelled"],
+            "delay_last_lateness_ms": scheduler["last_lateness_ms"],
+            "delay_mean_lateness_ms": scheduler["mean_lateness_ms"],
+            "delay_max_lateness_ms": scheduler["max_lateness_ms"],
+        }
+
+
+# The game sensors share the device of the ConnectedRoom sensor. They have no
+# state class, a season of games is not worth long-term statistics.
+class ConnectedRoomGameSensor(CoordinatorEntity, SensorEntity):
+    """Base representation of a sensor of the current game."""
+
+    should_poll = False
+
+    # Kept on the state for automations and cards, not in the history
+    _unrecorded_attributes = frozenset({"natural_text", "payload"})
+
+    key = None
+    name_suffix = None
+
+    def __init__(self, coordinator, device):
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+
+        self._unique_id = device.data["unique_id"]
+        self._attr_unique_id = f"{self._unique_id}_{self.key}"
+        self._attr_name = f"ConnectedRoom {self.name_suffix}"
+
+    @property
+    def device_info(self):
+        """Return information to link this entity with the correct device."""
+        return {"identifiers": {(DOMAIN, self._unique_id)}}
+
+    @property
+    def game(self):
+        return self.coordinator.data["game"]
+
+    @property
+    def native_value(self):
+        return self.game[self.key]
+
+
+class ConnectedRoomScoreSensor(ConnectedRoomGameSensor):
+    """Score of the home or the away team."""
+
+    _attr_icon = "mdi:scoreboard"
+
+    def __init__(self, coordinator, device, side):
+        """Initialize the sensor."""
+        self.side = side
+        self.key = side + "_score"
+        self.name_suffix = side.capitalize() + " score"
+
+        super().__init__(coordinator, device)
+
+    @property
+    def extra_state_attributes(self):
+        return {"team": self.game[self.side + "_team"]}
+
+
+class ConnectedRoomPeriodSensor(ConnectedRoomGameSensor):
+    """Current period of the game."""
+
+    _attr_icon = "mdi:timer-outline"
+
+    key = "period"
+    name_suffix = "Period"
+
+
+class ConnectedRoomGameStatusSensor(ConnectedRoomGameSensor):
+    """Whether the game is in progress, in intermission or over."""
+
+    _attr_icon = "mdi:hockey-sticks"
+    _attr_device_class = SensorDeviceClass.ENUM
+    _attr_options = sorted(set(GAME_STATUSES.values()))
+
+    key = "status"
+    name_suffix = "Game status"
+
+    @property
+    def extra_state_attributes(self):
+        game = self.game
+
+        return {
+            "home_team": game["home_team"],
+            "away_team": game["away_team"],
+            "last_event": game["last_event"],
+            "updated_at": game["updated_at"],
+            "natural_text": game["natural_text"],
+            "payload": game["payload"],
+        }
+
+
+class ConnectedRoomLastScorerSensor(ConnectedRoomGameSensor):
+    """Player who scored the last goal."""
+
+    _attr_icon = "mdi:account-star"
+
+    key = "last_scorer"
+    name_suffix = "Last scorer"
+
+    @property
+    def extra_state_attributes(self):
+        return {"team": self.game["last_scorer_team"]}
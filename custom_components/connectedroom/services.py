@@ -0,0 +1,128 @@
+"""Services for the ConnectedRoom integration."""
+from __future__ import annotations
+
+import logging
+
+import voluptuous as vol
+from homeassistant.core import HomeAssistant
+from homeassistant.core import ServiceCall
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+
+from .const import DATA_PROFILER
+from .const import DOMAIN
+from .const import MAX_BROADCAST_DELAY
+from .const import MAX_PROFILE_DURATION
+from .profiler import SamplingProfiler
+
+_LOGGER = logging.getLogger(__name__)
+
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_DELAY = "delay"
+ATTR_DURATION = "duration"
+ATTR_INTERVAL = "interval"
+ATTR_TRACE_MEMORY = "trace_memory"
+
+SERVICE_SET_BROADCAST_DELAY = "set_broadcast_delay"
+SERVICE_CANCEL_DELAYED_EVENTS = "cancel_delayed_events"
+SERVICE_START_PROFILE = "start_profile"
+SERVICE_STOP_PROFILE = "stop_profile"
+
+SET_BROADCAST_DELAY_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_DELAY): vol.All(
+            vol.Coerce(float), vol.Range(min=0, max=MAX_BROADCAST_DELAY)
+        ),
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+    }
+)
+
+CANCEL_DELAYED_EVENTS_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+    }
+)
+
+START_PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_DURATION, default=60): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=MAX_PROFILE_DURATION)
+        ),
+        vol.Optional(ATTR_INTERVAL, default=0.01): vol.All(
+            vol.Coerce(float), vol.Range(min=0.001, max=1)
+        ),
+        vol.Optional(ATTR_TRACE_MEMORY, default=False): cv.boolean,
+    }
+)
+
+
+def _coordinators(hass: HomeAssistant, call: ServiceCall):
+    coordinators = hass.data.get(DOMAIN, {})
+
+    entry_id = call.data.get(ATTR_CONFIG_ENTRY_ID)
+
+    if entry_id is not None:
+        return [coordinators[entry_id]] if entry_id in coordinators else []
+
+    return list(coordinators.values())
+
+
+async def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the ConnectedRoom services."""
+
+    if hass.services.has_service(DOMAIN, SERVICE_SET_BROADCAST_DELAY):
+        return
+
+    async def set_broadcast_delay(call: ServiceCall) -> None:
+        for coordinator in _coordinators(hass, call):
+            coordinator.connectedroom.set_broadcast_delay(call.data[ATTR_DELAY])
+            coordinator.async_update_listeners()
+
+    async def cancel_delayed_events(call: ServiceCall) -> None:
+        for coordinator in _coordinators(hass, call):
+            cancelled = coordinator.connectedroom.cancel_delayed_events()
+            _LOGGER.debug("Cancelled %s delayed events", cancelled)
+            coordinator.async_update_listeners()
+
+    async def start_profile(call: ServiceCall) -> None:
+        profiler = hass.data.get(DATA_PROFILER)
+
+        if profiler is None:
+            profiler = hass.data[DATA_PROFILER] = SamplingProfiler(
+                hass.config.path(DOMAIN + "_profiles")
+            )
+
+        if not profiler.start(
+            call.data[ATTR_DURATION],
+            call.data[ATTR_INTERVAL],
+            call.data[ATTR_TRACE_MEMORY],
+        ):
+            raise HomeAssistantError("A ConnectedRoom profile is already running")
+
+    async def stop_profile(call: ServiceCall) -> None:
+        profiler = hass.data.get(DATA_PROFILER)
+
+        if profiler is None or not profiler.running:
+            raise HomeAssistantError("No ConnectedRoom profile is running")
+
+        profiler.stop()
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SET_BROADCAST_DELAY,
+        set_broadcast_delay,
+        schema=SET_BROADCAST_DELAY_SCHEMA,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_CANCEL_DELAYED_EVENTS,
+        cancel_delayed_events,
+        schema=CANCEL_DELAYED_EVENTS_SCHEMA,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_START_PROFILE,
+        start_profile,
+        schema=START_PROFILE_SCHEMA,
+    )
+    hass.services.async_register(DOMAIN, SERVICE_STOP_PROFILE, stop_profile)
@@ -0,0 +1,66 @@
+"""Channel subscriptions that survive ConnectedRoom reconnects."""
+from __future__ import annotations
+
+import weakref
+
+from pysher.channel import Channel
+
+
+class SubscriptionManager:
+    """Own the channels and their bindings of a ConnectedRoom.
+
+    The channels live in the shared connection hub, the manager only keeps
+    track of the ones its entry uses.
+    """
+
+    def __init__(self, connected_room) -> None:
+        self._connected_room = weakref.ref(connected_room)
+        self.channels: dict[str, Channel] = {}
+
+    @property
+    def hub(self):
+        connected_room = self._connected_room()
+
+        return connected_room.hub if connected_room is not None else None
+
+    def subscribe(self, channel_name: str) -> Channel:
+        channel = self.channels.get(channel_name)
+
+        if channel is None:
+            connected_room = self._connected_room()
+            channel = connected_room.hub.subscribe(
+                channel_name, connected_room.auth["websocket_key"]
+            )
+            self.channels[channel_name] = channel
+
+        return channel
+
+    def bind(self, channel_name: str, event_name: str, callback) -> bool:
+        channel = self.subscribe(channel_name)
+
+        if event_name in channel.event_callbacks:
+            return False
+
+        channel.bind(event_name, callback)
+
+        return True
+
+    def unbind(self, channel_name: str, event_name: str) -> None:
+        channel = self.channels.get(channel_name)
+
+        if channel is not None:
+            channel.event_callbacks.pop(event_name, None)
+
+    def bound_events(self, channel_name: str) -> set[str]:
+        channel = self.channels.get(channel_name)
+
+        return set(channel.event_callbacks) if channel is not None else set()
+
+    def teardown(self) -> None:
+        hub = self.hub
+
+        for channel_name in self.channels:
+            if hub is not None:
+                hub.unsubscribe(channel_name)
+
+        self.channels.clear()
@@ -0,0 +1,169 @@
+"""Light and switch entities selected by a target."""
+from __future__ import annotations
+
+import logging
+from collections.abc import Mapping
+
+from homeassistant.core import callback
+from homeassistant.core import CALLBACK_TYPE
+from homeassistant.core import Event
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.area_registry import EVENT_AREA_REGISTRY_UPDATED
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.device_registry import EVENT_DEVICE_REGISTRY_UPDATED
+from homeassistant.helpers.entity_registry import EVENT_ENTITY_REGISTRY_UPDATED
+from homeassistant.helpers.label_registry import EVENT_LABEL_REGISTRY_UPDATED
+
+_LOGGER = logging.getLogger(__name__)
+
+DOMAINS = ("light", "switch")
+
+# Registry changes within this many seconds are applied together
+REFRESH_COOLDOWN = 2
+
+
+def _ids(value) -> tuple[str, ...]:
+    if not value:
+        return ()
+
+    if isinstance(value, str):
+        return (value,)
+
+    return tuple(value)
+
+
+def _selectable(entry: er.RegistryEntry) -> bool:
+    """Whether an entity is included when its device, area or label is."""
+    return (
+        entry.domain in DOMAINS
+        and entry.disabled_by is None
+        and entry.hidden_by is None
+        and entry.entity_category is None
+    )
+
+
+@callback
+def resolve_target(hass: HomeAssistant, target: Mapping | None) -> tuple[str, ...]:
+    """Expand the entities, devices, areas and labels of a target."""
+    if not target:
+        return ()
+
+    entity_registry = er.async_get(hass)
+    device_registry = dr.async_get(hass)
+
+    # Selected entities are kept as is, even without a registry entry
+    entity_ids = set(_ids(target.get("entity_id")))
+
+    # Device id to the area it was selected through, None when selected
+    # directly or through a label
+    devices = {device_id: None for device_id in _ids(target.get("device_id"))}
+
+    for area_id in _ids(target.get("area_id")):
+        for entry in er.async_entries_for_area(entity_registry, area_id):
+            if _selectable(entry):
+                entity_ids.add(entry.entity_id)
+
+        for device in dr.async_entries_for_area(device_registry, area_id):
+            devices.setdefault(device.id, area_id)
+
+    for label_id in _ids(target.get("label_id")):
+        for entry in er.async_entries_for_label(entity_registry, label_id):
+            if _selectable(entry):
+                entity_ids.add(entry.entity_id)
+
+        for device in dr.async_entries_for_label(device_registry, label_id):
+            devices[device.id] = None
+
+    for device_id, area_id in devices.items():
+        for entry in er.async_entries_for_device(entity_registry, device_id):
+            # An entity moved to another area left the area of its device
+            if area_id is not None and entry.area_id not in (None, area_id):
+                continue
+
+            if _selectable(entry):
+                entity_ids.add(entry.entity_id)
+
+    return tuple(sorted(entity_ids))
+
+
+class TargetIndex:
+    """Entities of a target, kept up to date with the registries.
+
+    on_change is called with the added and removed entity ids when an entity,
+    device, area or label change alters the selection.
+    """
+
+    def __init__(self, hass: HomeAssistant, target: Mapping | None, on_change) -> None:
+        self.hass = hass
+        self.target = target
+        self.on_change = on_change
+        self.entity_ids: tuple[str, ...] = ()
+        self._debouncer = Debouncer(
+            hass,
+            _LOGGER,
+            cooldown=REFRESH_COOLDOWN,
+            immediate=False,
+            function=self.async_refresh,
+        )
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        self.entity_ids = resolve_target(self.hass, self.target)
+
+        unsubs = [
+            self.hass.bus.async_listen(
+                EVENT_ENTITY_REGISTRY_UPDATED,
+                self._async_registry_updated,
+                event_filter=self._async_relevant_entity,
+            ),
+            *(
+                self.hass.bus.async_listen(event_type, self._async_registry_updated)
+                for event_type in (
+                    EVENT_DEVICE_REGISTRY_UPDATED,
+                    EVENT_AREA_REGISTRY_UPDATED,
+                    EVENT_LABEL_REGISTRY_UPDATED,
+                )
+            ),
+        ]
+
+        @callback
+        def stop() -> None:
+            for unsub in unsubs:
+                unsub()
+
+            self._debouncer.async_shutdown()
+
+        return stop
+
+    @callback
+    def async_set_target(self, target: Mapping | None) -> None:
+        self.target = target
+        self.async_refresh()
+
+    @callback
+    def async_refresh(self) -> None:
+        entity_ids = resolve_target(self.hass, self.target)
+
+        if entity_ids == self.entity_ids:
+            return
+
+        added = set(entity_ids) - set(self.entity_ids)
+        removed = set(self.entity_ids) - set(entity_ids)
+
+        self.entity_ids = entity_ids
+
+        _LOGGER.debug("Devices changed, added %s, removed %s", added, removed)
+
+        self.on_change(added, removed)
+
+    @callback
+    def _async_relevant_entity(self, event_data) -> bool:
+        entity_id = event_data.get("entity_id", "")
+
+        return entity_id.split(".", 1)[0] in DOMAINS
+
+    @callback
+    def _async_registry_updated(self, event: Event) -> None:
+        self._debouncer.async_schedule_call()
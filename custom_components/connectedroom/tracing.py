@@ -0,0 +1,165 @@
+"""Trace ids following a ConnectedRoom event from its frame to its effects."""
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import time
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import callback
+from homeassistant.core import Context
+from homeassistant.core import HomeAssistant
+
+from .const import DATA_TRACER
+from .const import DOMAIN
+
+TRACE_FILE = DOMAIN + "_trace.log"
+TRACE_MAX_BYTES = 1024 * 1024
+TRACE_BACKUP_COUNT = 3
+
+# The trace of the event being handled. Contexts are copied by the event
+# queue, the scheduler and the executor, so deferred work keeps its trace.
+_current_trace: ContextVar[Trace | None] = ContextVar(
+    "connectedroom_trace", default=None
+)
+
+
+def get_tracer(hass: HomeAssistant) -> Tracer:
+    tracer = hass.data.get(DATA_TRACER)
+
+    if tracer is None:
+        tracer = hass.data[DATA_TRACER] = Tracer(hass.config.path(TRACE_FILE))
+
+        @callback
+        def close(event) -> None:
+            tracer.close()
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, close)
+
+    return tracer
+
+
+def current_trace() -> Trace | None:
+    return _current_trace.get()
+
+
+def current_context() -> Context | None:
+    """Home Assistant context of the current trace, for service calls."""
+    trace = _current_trace.get()
+
+    return trace.context if trace is not None else None
+
+
+def trace_span(name: str, **attributes):
+    """Time a block in the current trace, if any."""
+    trace = _current_trace.get()
+
+    if trace is None:
+        return contextlib.nullcontext()
+
+    return trace.span(name, **attributes)
+
+
+def trace_event(name: str, **attributes) -> None:
+    trace = _current_trace.get()
+
+    if trace is not None:
+        trace.event(name, **attributes)
+
+
+@contextlib.contextmanager
+def start_trace(tracer: Tracer, name: str, **attributes):
+    """Make a new trace current for the work started in the block."""
+    trace = Trace(tracer, name)
+    token = _current_trace.set(trace)
+
+    trace.event("received", **attributes)
+
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+class Trace:
+    """Spans of one received event.
+
+    The trace id is the id of the Home Assistant context of the service calls
+    and bus events, the logbook and automation traces show the same id.
+    """
+
+    def __init__(self, tracer: Tracer, name: str) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.context = Context()
+        self.started = time.monotonic()
+
+    @property
+    def trace_id(self) -> str:
+        return self.context.id
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes):
+        start = time.monotonic()
+
+        try:
+            yield
+        finally:
+            self.tracer.record(self, name, start, time.monotonic() - start, attributes)
+
+    def event(self, name: str, **attributes) -> None:
+        self.tracer.record(self, name, time.monotonic(), None, attributes)
+
+
+class Tracer:
+    """Write the spans as JSON lines to a small rotating file."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # Opened on the first span, never from the event loop
+        self._handler = RotatingFileHandler(
+            path,
+            maxBytes=TRACE_MAX_BYTES,
+            backupCount=TRACE_BACKUP_COUNT,
+            encoding="utf-8",
+            delay=True,
+        )
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+
+    def record(self, trace: Trace, name: str, start: float, duration, attributes):
+        line = {
+            "time": round(time.time(), 3),
+            "trace_id": trace.trace_id,
+            "trace": trace.name,
+            "span": name,
+            "offset_ms": round((start - trace.started) * 1000, 1),
+            "duration_ms": None if duration is None else round(duration * 1000, 1),
+        }
+
+        if attributes:
+            line["attributes"] = attributes
+
+        self._handler.handle(
+            logging.makeLogRecord({"msg": json.dumps(line, default=str)})
+        )
+
+    def close(self) -> None:
+        self._handler.close()
+
+
+class TraceFilter(logging.Filter):
+    """Prefix the log lines of a traced event with its trace id."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace = _current_trace.get()
+
+        if trace is not None:
+            record.msg = f"[{trace.trace_id}] {record.msg}"
+
+        return True
+
+
+TRACE_FILTER = TraceFilter()
@@ -0,0 +1,114 @@
+"""Speakers kept awake during a game, for the goal horn to start on time."""
+from __future__ import annotations
+
+import logging
+
+from homeassistant.components.media_player import MediaPlayerEntityFeature
+from homeassistant.const import ATTR_SUPPORTED_FEATURES
+from homeassistant.const import STATE_OFF
+from homeassistant.const import STATE_STANDBY
+
+from .const import WARM_UP_INTERVAL
+from .const import WARM_UP_TAG
+from .executor import ExecutorFull
+
+_LOGGER = logging.getLogger(__name__)
+
+# A player in one of these states takes seconds to start the horn
+ASLEEP_STATES = (STATE_OFF, STATE_STANDBY)
+
+
+class SpeakerWarmUp:
+    """Wake the goal horn and TTS players from game_start to game_end.
+
+    Cast players drop their receiver app and Sonos players their source when
+    idle, the first play_media then starts seconds late. Every
+    WARM_UP_INTERVAL the players found asleep are turned on again, what is
+    playing is never interrupted.
+    """
+
+    def __init__(self, connected_room) -> None:
+        self.connected_room = connected_room
+        self.active = False
+
+    @property
+    def players(self) -> tuple[str, ...]:
+        config = self.connected_room.config
+
+        return tuple(dict.fromkeys(config.goal_horn_devices + config.tts_devices))
+
+    def start(self) -> None:
+        if self.active:
+            return
+
+        self.active = True
+        self.connected_room.metrics.inc("warm_up.started")
+
+        # Service calls block, never make them from the event loop
+        self.connected_room.scheduler.schedule(0, self.keep_alive, tag=WARM_UP_TAG)
+
+    def stop(self) -> None:
+        self.active = False
+        self.connected_room.scheduler.cancel(WARM_UP_TAG)
+
+    def is_warm(self, entity_ids) -> bool:
+        """Whether the players should start a horn on time.
+
+        Only while the warm-up runs and none of them has fallen asleep since
+        it last woke them.
+        """
+        if not self.active:
+            return False
+
+        hass = self.connected_room.hass
+
+        for entity_id in entity_ids:
+            state = hass.states.get(entity_id)
+
+            if state is not None and state.state in ASLEEP_STATES:
+                return False
+
+        return True
+
+    def keep_alive(self) -> None:
+        """Turn on the sleeping players, then again every WARM_UP_INTERVAL."""
+        if not self.active:
+            return
+
+        hass = self.connected_room.hass
+        asleep = []
+
+        for entity_id in self.players:
+            state = hass.states.get(entity_id)
+
+            if state is None or state.state not in ASLEEP_STATES:
+                continue
+
+            features = state.attributes.get(ATTR_SUPPORTED_FEATURES, 0)
+
+            if not features & MediaPlayerEntityFeature.TURN_ON:
+                continue
+
+            asleep.append(entity_id)
+
+        if asleep:
+            # Keep the scheduler thread free for the deadlines
+            try:
+                self.connected_room.executor.submit(self.turn_on, asleep)
+            except ExecutorFull:
+                # Still asleep on the next round
+                self.connected_room.metrics.inc("warm_up.rejected")
+
+        self.connected_room.scheduler.schedule(
+            WARM_UP_INTERVAL, self.keep_alive, tag=WARM_UP_TAG
+        )
+
+    def turn_on(self, entity_ids: list[str]) -> None:
+        _LOGGER.debug("Waking up %s", entity_ids)
+
+        self.connected_room.metrics.inc("warm_up.turned_on", len(entity_ids))
+        self.connected_room.call_service(
+            domain="media_player",
+            service="turn_on",
+            target={"entity_id": entity_ids},
+        )
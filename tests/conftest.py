@@ -0,0 +1,205 @@
+"""Global fixtures for the ConnectedRoom integration."""
+import time
+import tracemalloc
+from unittest.mock import MagicMock
+
+import pytest
+from custom_components.connectedroom.connectedroom import ConnectedRoomDeviceEvents
+from custom_components.connectedroom.connectedroom import ConnectedRoomEvents
+from custom_components.connectedroom.const import DOMAIN
+from custom_components.connectedroom.coordinator import ConnectedRoomCoordinator
+from homeassistant.helpers import device_registry as dr
+from pytest_homeassistant_custom_component.common import async_mock_service
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+from tests.const import MOCK_AUTH
+from tests.const import MOCK_DATA
+
+pytest_plugins = "pytest_homeassistant_custom_component"
+
+# Every service the handlers call, recorded instead of run
+MOCKED_SERVICES = (
+    ("light", "turn_on"),
+    ("light", "turn_off"),
+    ("switch", "turn_on"),
+    ("switch", "turn_off"),
+    ("scene", "apply"),
+    ("media_player", "play_media"),
+    ("media_player", "media_stop"),
+    ("media_player", "turn_on"),
+    ("tts", "speak"),
+)
+
+LIGHT_GROUPS = ("primary", "secondary", "alternate")
+LIGHTS_PER_GROUP = 5
+
+
+# This fixture enables loading custom integrations in all tests.
+# Remove to enable selective use of this fixture
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations):
+    yield
+
+
+@pytest.fixture
+def service_calls(hass):
+    """Calls of the mocked services, by domain.service."""
+    return {
+        f"{domain}.{service}": async_mock_service(hass, domain, service)
+        for domain, service in MOCKED_SERVICES
+    }
+
+
+@pytest.fixture
+async def connected_room_factory(hass, service_calls):
+    """Build a ConnectedRoom of a given size, without any connection.
+
+    The devices of the entry, the lights of the colour groups, the goal horn
+    and TTS players and the synced entities are created in the registries
+    and the state machine. The handlers are run with the benchmark fixture.
+    """
+    coordinators = []
+
+    async def factory(
+        devices=1, light_groups=1, media_players=1, synced_entities=1, **options
+    ):
+        lights = {}
+
+        for group in LIGHT_GROUPS[:light_groups]:
+            lights[group + "_lights"] = [
+                f"light.{group}_{index}" for index in range(LIGHTS_PER_GROUP)
+            ]
+
+            for entity_id in lights[group + "_lights"]:
+                hass.states.async_set(
+                    entity_id,
+                    "on",
+                    {
+                        "supported_color_modes": ["xy"],
+                        "color_mode": "xy",
+                        "brightness": 200,
+                        "xy_color": [0.3, 0.3],
+                    },
+                )
+
+        players = [f"media_player.speaker_{index}" for index in range(media_players)]
+
+        for entity_id in players:
+            hass.states.async_set(entity_id, "idle", {"media_content_id": None})
+
+        synced = [f"light.synced_{index}" for index in range(synced_entities)]
+
+        for entity_id in synced:
+            hass.states.async_set(
+                entity_id,
+                "on",
+                {"supported_color_modes": ["hs"], "color_mode": "hs", "brightness": 10},
+            )
+
+        entry = MockConfigEntry(
+            domain=DOMAIN,
+            data=MOCK_DATA,
+            options={
+                **lights,
+                "goal_horn_devices": players,
+                "tts_devices": players,
+                "tts_provider": "tts.test",
+                "devices": {"entity_id": synced},
+                **options,
+            },
+        )
+        entry.add_to_hass(hass)
+
+        device_registry = dr.async_get(hass)
+
+        for index in range(devices):
+            device_registry.async_get_or_create(
+                config_entry_id=entry.entry_id,
+                identifiers={(DOMAIN, f"device_{index}")},
+            )
+
+        coordinator = ConnectedRoomCoordinator(hass, entry)
+        coordinators.append(coordinator)
+
+        connected_room = coordinator.connectedroom
+        connected_room.auth = MOCK_AUTH
+        # No pusher, the handlers are called directly
+        connected_room.subscriptions = MagicMock()
+        connected_room.devices.entity_ids = tuple(synced)
+        connected_room.events = ConnectedRoomEvents(
+            connected_room, MOCK_DATA["unique_id"]
+        )
+        connected_room.device_events = ConnectedRoomDeviceEvents(
+            connected_room, MOCK_AUTH["integration_key"]
+        )
+
+        return connected_room
+
+    yield factory
+
+    for coordinator in coordinators:
+        connected_room = coordinator.connectedroom
+        connected_room.stop()
+        await coordinator.async_shutdown()
+
+        # The threads of the entry must be gone before the next test
+        connected_room.executor.shutdown(wait=True)
+
+        for worker in (connected_room.scheduler, connected_room.event_queue):
+            if worker._thread is not None:
+                worker._thread.join()
+
+
+@pytest.fixture
+def benchmark(hass, record_property):
+    """Run a handler once per payload like the queue worker does.
+
+    The runs are traced by tracemalloc so run_handler observes the
+    handler_allocated_bytes histogram. The mean time of a run, the events
+    per second and the bytes allocated per event are recorded as properties
+    of the test, pytest --junitxml keeps them for comparing runs.
+    """
+
+    def allocated(connected_room, name):
+        histogram = connected_room.metrics.histograms.get(
+            "handler_allocated_bytes." + name
+        )
+        return (0, 0) if histogram is None else (histogram.count, histogram.total)
+
+    async def run(connected_room, handler, payloads):
+        name = handler.__name__
+        started_tracing = not tracemalloc.is_tracing()
+
+        if started_tracing:
+            tracemalloc.start()
+
+        try:
+            count, total = allocated(connected_room, name)
+            started = time.perf_counter()
+
+            for args in payloads:
+                await hass.async_add_executor_job(
+                    connected_room.run_handler, handler, *args
+                )
+
+            await hass.async_block_till_done()
+
+            elapsed = time.perf_counter() - started
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+
+        mean = elapsed / len(payloads)
+        record_property(name + "_mean_ms", round(mean * 1000, 3))
+        record_property(name + "_events_per_s", round(len(payloads) / elapsed, 1))
+
+        after_count, after_total = allocated(connected_room, name)
+
+        if after_count > count:
+            record_property(
+                name + "_allocated_bytes_per_event",
+                round((after_total - total) / (after_count - count)),
+            )
+
+        return mean
+
+    return run
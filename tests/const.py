@@ -0,0 +1,9 @@
+"""Constants for the ConnectedRoom tests."""
+MOCK_DATA = {"api_key": "test-api-key", "unique_id": "test-unique-id"}
+
+MOCK_AUTH = {
+    "api_key": "test-api-key",
+    "unique_id": "test-unique-id",
+    "integration_key": "test-integration-key",
+    "websocket_key": "test-websocket-key",
+}
@@ -0,0 +1,167 @@
+"""Tests of the translation of the device commands to service calls."""
+import json
+import time
+
+import pytest
+from custom_components.connectedroom.commands import CommandTable
+from custom_components.connectedroom.commands import entity_commands
+from custom_components.connectedroom.commands import EntityCommands
+from homeassistant.helpers import entity_registry as er
+from homeassistant.util import color as color_util
+
+XY = [0.675, 0.322]
+
+XY_LIGHT = EntityCommands("light", "xy", True, True)
+HS_LIGHT = EntityCommands("light", "hs", True, False)
+RGB_LIGHT = EntityCommands("light", "rgbww", True, False)
+WHITE_LIGHT = EntityCommands("light", "color_temp", True, False)
+ON_OFF_LIGHT = EntityCommands("light", None, False, False)
+SWITCH = EntityCommands("switch", None, False, False)
+
+COMMANDS = 10000
+
+
+@pytest.mark.parametrize(
+    ("commands", "expected"),
+    (
+        (XY_LIGHT, {"xy_color": XY}),
+        (HS_LIGHT, {"hs_color": list(color_util.color_xy_to_hs(*XY))}),
+        (RGB_LIGHT, {"rgb_color": list(color_util.color_xy_to_RGB(*XY))}),
+        (WHITE_LIGHT, {}),
+    ),
+    ids=("xy", "hs", "rgb", "white"),
+)
+def test_color_data(commands, expected):
+    assert commands.color_data(XY) == expected
+    assert commands.translate({"action": "set_color", "color": XY}) == (
+        "light",
+        "turn_on",
+        expected,
+    )
+
+
+@pytest.mark.parametrize(
+    ("data", "expected"),
+    (
+        ({"action": "turn_on"}, ("switch", "turn_on", {})),
+        ({"action": "turn_off"}, ("switch", "turn_off", {})),
+        ({"action": "set_brightness", "brightness": 0}, ("switch", "turn_off", {})),
+        ({"action": "set_brightness", "brightness": 80}, ("switch", "turn_on", {})),
+        ({"action": "set_color", "color": XY}, ("switch", "turn_on", {})),
+        ({"action": "restore", "state": {"state": "off"}}, ("switch", "turn_off", {})),
+        ({"action": "restore", "state": {"state": "on"}}, ("switch", "turn_on", {})),
+        ({"action": "restore"}, ("switch", "turn_on", {})),
+        ({"action": "set_effect", "effect": "colorloop"}, None),
+    ),
+)
+def test_switch(data, expected):
+    assert SWITCH.translate(data) == expected
+
+
+@pytest.mark.parametrize(
+    ("commands", "expected"),
+    (
+        (XY_LIGHT, ("light", "turn_on", {"effect": "colorloop"})),
+        (HS_LIGHT, None),
+    ),
+    ids=("effects", "no_effects"),
+)
+def test_effect(commands, expected):
+    assert commands.translate({"action": "set_effect", "effect": "colorloop"}) == (
+        expected
+    )
+
+
+def test_brightness():
+    data = {"action": "set_brightness", "brightness": 80}
+
+    assert XY_LIGHT.translate(data) == ("light", "turn_on", {"brightness": 80})
+    assert ON_OFF_LIGHT.translate(data) == ("light", "turn_on", {})
+    assert ON_OFF_LIGHT.translate({**data, "brightness": 0}) == (
+        "light",
+        "turn_off",
+        {},
+    )
+
+
+def test_restore():
+    state = {"brightness": 120, "xy_color": XY}
+    call = XY_LIGHT.translate({"action": "restore", "state": state})
+
+    assert call == ("light", "turn_on", state)
+    # The command payload is not shared with the service call
+    assert call[2] is not state
+
+
+def test_unknown_action():
+    assert XY_LIGHT.translate({"action": "blink"}) is None
+
+
+async def test_entity_commands(hass):
+    registry = er.async_get(hass)
+    registry.async_get_or_create(
+        "light",
+        "demo",
+        "registry",
+        capabilities={"supported_color_modes": ["hs", "color_temp"]},
+    )
+    hass.states.async_set(
+        "light.state_only",
+        "on",
+        {"supported_color_modes": ["rgb"], "effect_list": ["colorloop"]},
+    )
+
+    assert entity_commands(hass, "light.demo_registry") == EntityCommands(
+        "light", "hs", True, False
+    )
+    # No registry entry, the state attributes are used
+    assert entity_commands(hass, "light.state_only") == EntityCommands(
+        "light", "rgb", True, True
+    )
+    assert entity_commands(hass, "switch.plug") == SWITCH
+    # Not loaded yet
+    assert entity_commands(hass, "light.unknown") is None
+    # Until it is, Home Assistant converts the colour
+    assert CommandTable(hass).get("light.unknown") == XY_LIGHT
+
+
+async def test_command_throughput(
+    hass, connected_room_factory, benchmark, service_calls, record_property
+):
+    """Translate with the table built on bind, and without it as before."""
+    connected_room = await connected_room_factory(synced_entities=50)
+    entity_ids = connected_room.devices.entity_ids
+    commands = connected_room.commands
+    # No colour conversion, only the lookup of the entity differs
+    brightness = {"action": "set_brightness", "brightness": 80}
+
+    def translate_all(get):
+        started = time.perf_counter()
+
+        for index in range(COMMANDS):
+            get(entity_ids[index % len(entity_ids)]).translate(brightness)
+
+        return COMMANDS / (time.perf_counter() - started)
+
+    before = await hass.async_add_executor_job(
+        translate_all, lambda entity_id: entity_commands(hass, entity_id)
+    )
+    after = await hass.async_add_executor_job(translate_all, commands.get)
+
+    record_property("translations_per_second_before", round(before))
+    record_property("translations_per_second_after", round(after))
+
+    assert len(commands) == len(entity_ids)
+    assert after > before
+
+    # The whole path, from the command to the service call
+    command = json.dumps({"action": "set_color", "color": XY})
+    mean = await benchmark(
+        connected_room,
+        connected_room.device_events.on_execute,
+        [(command, entity_ids[index % len(entity_ids)]) for index in range(500)],
+    )
+
+    record_property("commands_per_second", round(1 / mean))
+
+    assert len(service_calls["light.turn_on"]) == 500
@@ -0,0 +1,110 @@
+"""Bus load of the ConnectedRoom events and their device triggers."""
+import time
+
+import pytest
+from custom_components.connectedroom.const import DOMAIN
+from custom_components.connectedroom.const import EVENT_CONNECTEDROOM
+from custom_components.connectedroom.device_trigger import async_attach_trigger
+from homeassistant.const import CONF_DEVICE_ID
+from homeassistant.const import CONF_DOMAIN
+from homeassistant.const import CONF_ENTITY_ID
+from homeassistant.const import CONF_PLATFORM
+from homeassistant.const import CONF_TYPE
+from homeassistant.core import callback
+from homeassistant.helpers import device_registry as dr
+
+GAME_EVENTS = ("game_start", "goal", "goal", "period_end", "game_end")
+
+
+async def attach_triggers(hass, device_ids, trigger_type="goal"):
+    """Attach a device trigger to every device, return the runs by device."""
+    runs = {device_id: [] for device_id in device_ids}
+
+    for device_id in device_ids:
+
+        @callback
+        def action(run_variables, context=None, device_id=device_id):
+            runs[device_id].append(run_variables["trigger"]["event"].data)
+
+        await async_attach_trigger(
+            hass,
+            {
+                CONF_PLATFORM: "device",
+                CONF_DOMAIN: DOMAIN,
+                CONF_DEVICE_ID: device_id,
+                CONF_ENTITY_ID: "sensor.connectedroom_sensor",
+                CONF_TYPE: trigger_type,
+            },
+            action,
+            {"trigger_data": {}},
+        )
+
+    return runs
+
+
+@pytest.mark.parametrize("single_event", (False, True), ids=("per_device", "single"))
+@pytest.mark.parametrize("devices", (1, 10, 100))
+async def test_bus_load(
+    hass, connected_room_factory, record_property, devices, single_event
+):
+    connected_room = await connected_room_factory(
+        devices=devices, single_event=single_event
+    )
+    device_ids = [
+        device.id
+        for device in dr.async_entries_for_config_entry(
+            dr.async_get(hass), connected_room.coordinator.config_entry.entry_id
+        )
+    ]
+    runs = await attach_triggers(hass, device_ids)
+
+    fired = []
+    hass.bus.async_listen(EVENT_CONNECTEDROOM, fired.append)
+
+    def play_game():
+        for index, event_type in enumerate(GAME_EVENTS):
+            connected_room.events.fire_event(event_type, {"id": index})
+
+    started = time.perf_counter()
+    await hass.async_add_executor_job(play_game)
+    await hass.async_block_till_done()
+
+    record_property(
+        "fire_ms", round((time.perf_counter() - started) / len(GAME_EVENTS) * 1000, 3)
+    )
+    record_property("bus_events", len(fired))
+
+    goals = GAME_EVENTS.count("goal")
+    per_game_event = 1 if single_event else devices
+
+    assert len(fired) == len(GAME_EVENTS) * per_game_event
+    assert connected_room.metrics.as_dict()["counters"]["bus.events_fired"] == len(
+        fired
+    )
+    # Every device runs its automation once per goal, in both modes
+    assert all(len(device_runs) == goals for device_runs in runs.values())
+
+
+async def test_filter_event_device_ids(hass):
+    device_ids = ["device_a", "device_b", "device_c"]
+    runs = await attach_triggers(hass, device_ids)
+    period_runs = await attach_triggers(hass, device_ids, "period_end")
+
+    hass.bus.async_fire(
+        EVENT_CONNECTEDROOM, {"type": "goal", "device_ids": ["device_a", "device_b"]}
+    )
+    # The device_ids of a single event win over its device_id
+    hass.bus.async_fire(
+        EVENT_CONNECTEDROOM,
+        {"type": "goal", "device_id": "device_c", "device_ids": ["device_a"]},
+    )
+    hass.bus.async_fire(EVENT_CONNECTEDROOM, {"type": "goal", "device_id": "device_c"})
+    hass.bus.async_fire(EVENT_CONNECTEDROOM, {"type": "goal", "device_id": "other"})
+    await hass.async_block_till_done()
+
+    assert {device_id: len(device_runs) for device_id, device_runs in runs.items()} == {
+        "device_a": 2,
+        "device_b": 1,
+        "device_c": 1,
+    }
+    assert not any(period_runs.values())
@@ -0,0 +1,196 @@
+"""Scale tests of the devices sync, with thousands of synthetic entities."""
+import hashlib
+import json
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler
+from http.server import HTTPServer
+from unittest.mock import patch
+
+import pytest
+from custom_components.connectedroom.connectedroom import ConnectedRoom
+from custom_components.connectedroom.connectedroom import device_sync_entries
+from custom_components.connectedroom.connectedroom import devices_sync_content
+from custom_components.connectedroom.const import DEVICES_SYNC_CHUNK_BYTES
+from custom_components.connectedroom.const import DEVICES_SYNC_PATH
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+SIZES = (5000, 10000)
+
+ENTITIES_PER_DEVICE = 4
+# Selected but deleted since, skipped by the sync
+MISSING_ENTITIES = 100
+
+RESOLVE_BUDGET = 2.0
+
+CAPABILITIES = {
+    "supported_color_modes": ["xy", "color_temp"],
+    "min_color_temp_kelvin": 2000,
+    "max_color_temp_kelvin": 6500,
+}
+
+
+@pytest.fixture(params=SIZES)
+def entity_ids(hass, request):
+    """Synthetic lights, a few per device, as in a large home."""
+    entry = MockConfigEntry(domain="demo")
+    entry.add_to_hass(hass)
+
+    entity_registry = er.async_get(hass)
+    device_registry = dr.async_get(hass)
+    entity_ids = []
+
+    for index in range(request.param):
+        device = device_registry.async_get_or_create(
+            config_entry_id=entry.entry_id,
+            identifiers={("demo", str(index // ENTITIES_PER_DEVICE))},
+            name=f"Device {index // ENTITIES_PER_DEVICE}",
+        )
+        entity = entity_registry.async_get_or_create(
+            "light",
+            "demo",
+            str(index),
+            device_id=device.id,
+            capabilities=CAPABILITIES,
+        )
+        entity_ids.append(entity.entity_id)
+
+    return entity_ids + [f"light.missing_{index}" for index in range(MISSING_ENTITIES)]
+
+
+class DevicesSyncHandler(BaseHTTPRequestHandler):
+    """Local stand-in of the devices sync API.
+
+    The body is hashed as it is read, keeping it would count in the memory
+    of the sender.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        digest = hashlib.sha256()
+        received = self.server.received
+
+        if self.headers.get("Transfer-Encoding") == "chunked":
+            while size := int(self.rfile.readline().strip(), 16):
+                digest.update(self.rfile.read(size))
+                self.rfile.readline()
+                received["chunks"] += 1
+                received["bytes"] += size
+
+            self.rfile.readline()
+        else:
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            digest.update(body)
+            received["chunks"] += 1
+            received["bytes"] += len(body)
+
+        received["path"] = self.path
+        received["sha256"] = digest.hexdigest()
+
+        reply = b'{"success": true}'
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api(socket_enabled):
+    """Serve the devices sync on 127.0.0.1, return what was received."""
+    server = HTTPServer(("127.0.0.1", 0), DevicesSyncHandler)
+    server.received = {"chunks": 0, "bytes": 0}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    with patch(
+        "custom_components.connectedroom.connectedroom.API_URL",
+        f"http://127.0.0.1:{server.server_port}",
+    ):
+        yield server.received
+
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+async def test_device_sync_entries(hass, entity_ids, record_property):
+    started = time.perf_counter()
+    entries = device_sync_entries(hass, entity_ids)
+    resolve_time = time.perf_counter() - started
+
+    record_property("resolve_ms", round(resolve_time * 1000, 1))
+
+    assert resolve_time < RESOLVE_BUDGET
+    assert len(entries) == len(entity_ids) - MISSING_ENTITIES
+    assert entries[0] == {
+        "entity_id": entity_ids[0],
+        "capabilities": CAPABILITIES,
+        "device_class": "light",
+        "name": "Device 0",
+    }
+
+
+async def test_devices_sync_content(hass, entity_ids, record_property):
+    payload = {"devices": device_sync_entries(hass, entity_ids)}
+    largest_entry = max(len(json.dumps(entry)) for entry in payload["devices"])
+
+    tracemalloc.start()
+
+    try:
+        chunks = []
+
+        for chunk in devices_sync_content(payload):
+            assert len(chunk) < DEVICES_SYNC_CHUNK_BYTES + largest_entry + 16
+            chunks.append(len(chunk))
+
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    body = b"".join(devices_sync_content(payload))
+
+    record_property("payload_bytes", len(body))
+    record_property("peak_encoding_bytes", peak)
+
+    assert json.loads(body) == payload
+    assert sum(chunks) == len(body)
+    # Never the whole body at once, about one chunk at a time
+    assert peak < len(body) / 4
+
+
+async def test_devices_sync_request(hass, entity_ids, api, record_property):
+    payload = {"devices": device_sync_entries(hass, entity_ids)}
+
+    def send():
+        tracemalloc.start()
+
+        try:
+            ConnectedRoom.devices_sync_request("test-api-key", payload)
+
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    started = time.perf_counter()
+    peak = await hass.async_add_executor_job(send)
+
+    record_property("send_ms", round((time.perf_counter() - started) * 1000, 1))
+    record_property("peak_send_bytes", peak)
+
+    body = b"".join(devices_sync_content(payload))
+
+    assert api["path"] == DEVICES_SYNC_PATH
+    assert api["bytes"] == len(body)
+    assert api["sha256"] == hashlib.sha256(body).hexdigest()
+    assert api["chunks"] > 1
+    # The client itself takes a few hundred kB, the body is streamed
+    assert peak < len(body) / 2
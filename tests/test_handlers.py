@@ -0,0 +1,344 @@
+"""Benchmarks of the ConnectedRoom event handlers, by size of the home."""
+import asyncio
+import json
+import threading
+from unittest.mock import patch
+
+import pytest
+from custom_components.connectedroom.connectedroom import ConnectedRoom
+from custom_components.connectedroom.const import EVENT_CLASS_GAME
+from custom_components.connectedroom.const import EVENT_CONNECTEDROOM
+from custom_components.connectedroom.const import GOAL_HORN_TAG
+from homeassistant.components.media_player import MediaPlayerEntityFeature
+from homeassistant.core import Event
+from homeassistant.core import State
+from tests.conftest import LIGHTS_PER_GROUP
+
+# devices, light groups, media players, synced entities
+SIZES = {
+    "small": (1, 1, 1, 1),
+    "medium": (10, 3, 4, 50),
+    "large": (100, 3, 10, 500),
+}
+
+ROUNDS = 5
+
+# Far above the few milliseconds of a run, only catches a regression in kind
+HANDLER_BUDGET = 0.5
+
+TEAM = {
+    "id": 8,
+    "name": "Canadiens",
+    "options": {
+        "primary_color_rgb": {"r": 175, "g": 30, "b": 45},
+        "secondary_color_rgb": {"r": 25, "g": 33, "b": 104},
+        "alternate_color_rgb": {"r": 255, "g": 255, "b": 255},
+    },
+}
+
+# Not an http URL, the length is never probed and the state fallback is used
+HORN = "media-source://media_source/local/horn.mp3"
+
+
+@pytest.fixture(params=SIZES.values(), ids=SIZES.keys())
+def size(request):
+    return dict(
+        zip(
+            ("devices", "light_groups", "media_players", "synced_entities"),
+            request.param,
+        )
+    )
+
+
+async def test_on_goal(hass, connected_room_factory, benchmark, service_calls, size):
+    connected_room = await connected_room_factory(**size)
+    fired = []
+    hass.bus.async_listen(EVENT_CONNECTEDROOM, fired.append)
+
+    payloads = [
+        (json.dumps({"id": index, "team": TEAM, "natural_text": "Goal!"}),)
+        for index in range(ROUNDS)
+    ]
+
+    mean = await benchmark(connected_room, connected_room.events.on_goal, payloads)
+
+    assert mean < HANDLER_BUDGET
+    assert len(fired) == ROUNDS * size["devices"]
+    # Every light group changes with a single scene
+    assert len(service_calls["scene.apply"]) == ROUNDS
+    assert not service_calls["light.turn_on"]
+    assert len(connected_room.light_snapshot) == size["light_groups"] * LIGHTS_PER_GROUP
+    assert connected_room.tts_after_goal_horn == "Goal!"
+
+
+async def test_on_goal_horn(
+    hass, connected_room_factory, benchmark, service_calls, size
+):
+    connected_room = await connected_room_factory(**size)
+    payloads = [(json.dumps({"audioFile": HORN}),)] * ROUNDS
+
+    mean = await benchmark(connected_room, connected_room.events.on_goal_horn, payloads)
+
+    assert mean < HANDLER_BUDGET
+    assert len(service_calls["media_player.play_media"]) == (
+        ROUNDS * size["media_players"]
+    )
+    assert connected_room.is_playing_horn
+    # Unknown length, the end of the horn is followed on the players
+    assert connected_room.last_goal_horn_unsub is not None
+
+
+async def test_on_goal_horn_latency_mode(hass, connected_room_factory):
+    connected_room = await connected_room_factory(media_players=2)
+    players = connected_room.config.goal_horn_devices
+    payload = json.dumps({"audioFile": HORN})
+
+    async def play(warm_up, states):
+        connected_room.warm_up.active = warm_up
+
+        for entity_id, state in zip(players, states):
+            hass.states.async_set(entity_id, state)
+
+        await hass.async_add_executor_job(
+            connected_room.run_handler, connected_room.events.on_goal_horn, payload
+        )
+        await hass.async_block_till_done()
+
+        for entity_id in players:
+            hass.states.async_set(entity_id, "playing")
+
+        await hass.async_block_till_done()
+
+    await play(True, ["idle", "idle"])
+    # A player asleep before the horn starts late, warm-up or not
+    await play(True, ["idle", "off"])
+    await play(False, ["idle", "idle"])
+
+    histograms = connected_room.metrics.histograms
+
+    assert histograms["horn.start_latency.warm"].count == len(players)
+    assert histograms["horn.start_latency.cold"].count == 2 * len(players)
+
+
+async def test_warm_up_wakes_players_from_the_executor(
+    hass, connected_room_factory, service_calls
+):
+    connected_room = await connected_room_factory(media_players=3)
+    players = connected_room.config.goal_horn_devices
+
+    for entity_id, state in zip(players, ("off", "standby", "idle")):
+        hass.states.async_set(
+            entity_id, state, {"supported_features": MediaPlayerEntityFeature.TURN_ON}
+        )
+
+    connected_room.warm_up.active = True
+    call_service = connected_room.call_service
+    threads = []
+
+    def call_service_and_record(**kwargs):
+        threads.append(threading.current_thread().name)
+        call_service(**kwargs)
+
+    with patch.object(connected_room, "call_service", call_service_and_record):
+        await hass.async_add_executor_job(connected_room.warm_up.keep_alive)
+        await hass.async_add_executor_job(connected_room.executor.shutdown, True)
+        await hass.async_block_till_done()
+
+    # One call for the sleeping players, off the scheduler thread
+    calls = service_calls["media_player.turn_on"]
+
+    assert [call.data["entity_id"] for call in calls] == [list(players[:2])]
+    assert len(threads) == 1
+    assert threads[0].startswith("ConnectedRoomWorker")
+    assert connected_room.metrics.counters["warm_up.turned_on"] == 2
+
+    connected_room.warm_up.stop()
+
+
+async def test_on_goal_horn_known_length(
+    hass, connected_room_factory, benchmark, service_calls, size
+):
+    connected_room = await connected_room_factory(**size)
+    connected_room.goal_horn_durations[HORN] = 10.0
+
+    await benchmark(
+        connected_room,
+        connected_room.events.on_goal_horn,
+        [(json.dumps({"audioFile": HORN}),)],
+    )
+
+    assert connected_room.last_goal_horn_unsub is None
+    assert connected_room.scheduler.cancel(GOAL_HORN_TAG) == 1
+
+
+async def test_play_tts_when_goal_horn_is_done(
+    hass, connected_room_factory, benchmark, size
+):
+    connected_room = await connected_room_factory(**size)
+    events = connected_room.events
+    players = connected_room.config.goal_horn_devices
+
+    payloads = [
+        (
+            Event(
+                "state_changed",
+                {
+                    "entity_id": entity_id,
+                    "old_state": State(
+                        entity_id, "playing", {"media_content_id": HORN}
+                    ),
+                    "new_state": State(entity_id, "idle", {"media_content_id": HORN}),
+                },
+            ),
+        )
+        for entity_id in players
+    ]
+
+    connected_room.is_playing_horn = True
+    connected_room.tts_after_goal_horn = "Goal!"
+
+    mean = await benchmark(
+        connected_room, events.play_tts_when_goal_horn_is_done, payloads
+    )
+
+    assert mean < HANDLER_BUDGET
+    # The first idle player ends the horn, the others are ignored
+    assert not connected_room.is_playing_horn
+    assert connected_room.tts_after_goal_horn is None
+    assert connected_room.scheduler.pending() == 1
+
+
+async def test_tts_after_goal_horn_with_full_executor(hass, connected_room_factory):
+    connected_room = await connected_room_factory()
+    connected_room.executor.max_queue = 0
+    connected_room.is_playing_horn = True
+    connected_room.tts_after_goal_horn = "Goal!"
+
+    # Run on the scheduler thread, which must not die of a full executor
+    await hass.async_add_executor_job(connected_room.events.goal_horn_deadline)
+
+    assert not connected_room.is_playing_horn
+    assert connected_room.metrics.counters["tts.rejected"] == 1
+
+
+async def test_on_execute(hass, connected_room_factory, benchmark, service_calls, size):
+    connected_room = await connected_room_factory(**size)
+    entity_ids = connected_room.devices.entity_ids
+    command = json.dumps({"action": "set_color", "color": [0.3, 0.3]})
+
+    mean = await benchmark(
+        connected_room,
+        connected_room.device_events.on_execute,
+        [(command, entity_id) for entity_id in entity_ids],
+    )
+
+    assert mean < HANDLER_BUDGET
+
+    calls = service_calls["light.turn_on"]
+
+    assert len(calls) == len(entity_ids)
+    assert all("hs_color" in call.data for call in calls)
+
+
+async def test_on_execute_restore_after_goal(
+    hass, connected_room_factory, service_calls
+):
+    connected_room = await connected_room_factory()
+    lights = [f"light.primary_{index}" for index in range(LIGHTS_PER_GROUP)]
+    command = json.dumps(
+        {"action": "restore", "state": {"state": "on", "brightness": 5}}
+    )
+
+    async def restore():
+        for entity_id in lights:
+            await hass.async_add_executor_job(
+                connected_room.run_handler,
+                connected_room.device_events.on_execute,
+                command,
+                entity_id,
+            )
+
+        await hass.async_block_till_done()
+
+    await hass.async_add_executor_job(
+        connected_room.snapshot_lights, {"primary": TEAM["options"]}
+    )
+    await restore()
+
+    # The first restore brings back all the lights of the snapshot, the cloud
+    # restores of the others are dropped
+    calls = service_calls["light.turn_on"]
+
+    assert len(calls) == 1
+    assert sorted(calls[0].data["entity_id"]) == lights
+    assert calls[0].data["xy_color"] == (0.3, 0.3)
+    assert connected_room.metrics.counters["commands.restored"] == LIGHTS_PER_GROUP - 1
+
+    # Late cloud restores of the celebration are dropped as well
+    await restore()
+
+    assert len(calls) == 1
+    assert connected_room.metrics.counters["commands.restored"] == (
+        2 * LIGHTS_PER_GROUP - 1
+    )
+
+    # The next goal takes a new snapshot, restored again on its first restore
+    await hass.async_add_executor_job(
+        connected_room.snapshot_lights, {"primary": TEAM["options"]}
+    )
+    await restore()
+
+    assert len(calls) == 2
+
+
+async def test_on_get_state(hass, connected_room_factory, benchmark, size):
+    connected_room = await connected_room_factory(**size)
+    entity_ids = connected_room.devices.entity_ids
+    request = json.dumps({"request_id": "request"})
+
+    with patch.object(ConnectedRoom, "state_reply_request") as state_reply_request:
+        mean = await benchmark(
+            connected_room,
+            connected_room.device_events.on_get_state,
+            [(request, entity_id) for entity_id in entity_ids],
+        )
+
+        # The replies are sent from the executor
+        for _ in range(100):
+            if state_reply_request.call_count == len(entity_ids):
+                break
+
+            await asyncio.sleep(0.01)
+
+    assert mean < HANDLER_BUDGET
+    assert state_reply_request.call_count == len(entity_ids)
+
+
+async def test_replay_keeps_the_missed_events_in_order(hass, connected_room_factory):
+    connected_room = await connected_room_factory()
+    connected_room.set_broadcast_delay(0)
+    events = connected_room.events
+    queued = []
+
+    missed = [
+        ("game_start", {"game": {"id": 1}}, False),
+        ("game_start", {"game": {"id": 2}}, True),
+        ("goal", {"team": TEAM}, True),
+        ("goal_horn", {"audioFile": HORN}, True),
+    ]
+
+    with patch.object(
+        connected_room.event_queue,
+        "put",
+        lambda event_class, handler, *args: queued.append((event_class, handler)),
+    ):
+        for event_name, data, fresh in missed:
+            events.replay(event_name, data, fresh)
+
+    # One class for all, the worker runs them as they happened
+    assert queued == [
+        (EVENT_CLASS_GAME, events.on_missed_event),
+        (EVENT_CLASS_GAME, events.on_game_start),
+        (EVENT_CLASS_GAME, events.on_goal),
+        (EVENT_CLASS_GAME, events.on_goal_horn),
+    ]
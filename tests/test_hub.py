@@ -0,0 +1,149 @@
+"""Tests of the connection hub across reconnects."""
+import gc
+import json
+import threading
+import tracemalloc
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pysher
+from custom_components.connectedroom.executor import BoundedExecutor
+from custom_components.connectedroom.hub import ConnectionHub
+from custom_components.connectedroom.metrics import MetricsRegistry
+from custom_components.connectedroom.subscriptions import SubscriptionManager
+
+RECONNECTS = 2000
+
+# A leak of a channel, binding or callback per reconnect is far above this
+MAX_MEMORY_GROWTH = 64 * 1024
+
+
+async def test_reconnects_keep_channels_and_memory_flat(hass, connected_room_factory):
+    connected_room = await connected_room_factory(synced_entities=20)
+    connected_room.subscriptions = SubscriptionManager(connected_room)
+    connected_room.events = connected_room.device_events = None
+    hub = connected_room.hub
+
+    # The tokens are signed for the socket id of the connection
+    with patch.object(pysher.Pusher, "connect"), patch.object(
+        ConnectionHub,
+        "_authenticate",
+        lambda hub, channel_name, key: "auth:" + hub.pusher.connection.socket_id,
+    ):
+        pusher = await connected_room.setup_websockets()
+        connection = pusher.connection
+
+        sent = []
+
+        # Only kept for the current connection, a mock would keep every call
+        with patch.object(
+            connection,
+            "send_event",
+            lambda event, data: sent.append((data["channel"], data.get("auth"))),
+        ):
+
+            def reconnect(socket_id):
+                # What the connection thread does once a new socket is open
+                sent.clear()
+                connection.needs_reconnect = True
+                data = json.dumps({"socket_id": socket_id})
+
+                for callback, args, kwargs in connection.event_callbacks[
+                    "pusher:connection_established"
+                ]:
+                    callback(data, *args, **kwargs)
+
+                connected_room.device_events.bind_devices()
+
+                # One subscribe per channel, signed for the new connection
+                assert sorted(sent) == sorted(
+                    (name, "auth:" + socket_id if name.startswith("private-") else None)
+                    for name in hub.channels
+                )
+
+            def counts():
+                subscriptions = connected_room.subscriptions
+
+                return (
+                    len(hub.channels),
+                    dict(hub._users),
+                    len(pusher.channels),
+                    {
+                        name: sorted(
+                            (event, len(callbacks))
+                            for event, callbacks in channel.event_callbacks.items()
+                        )
+                        for name, channel in subscriptions.channels.items()
+                    },
+                )
+
+            reconnect("0.0")
+            await hass.async_block_till_done()
+            expected = counts()
+
+            tracemalloc.start()
+
+            try:
+                gc.collect()
+                before = tracemalloc.take_snapshot()
+
+                for index in range(RECONNECTS):
+                    reconnect(f"{index}.{index}")
+                    await hass.async_block_till_done()
+
+                gc.collect()
+                after = tracemalloc.take_snapshot()
+            finally:
+                tracemalloc.stop()
+
+            assert counts() == expected
+
+        connection.state = "disconnected"
+
+    assert expected[0] == 2
+    assert all(count == 1 for bindings in expected[3].values() for _, count in bindings)
+    assert connected_room.metrics.as_dict()["counters"]["connection.established"] == (
+        RECONNECTS + 1
+    )
+
+    growth = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+    assert growth < MAX_MEMORY_GROWTH
+
+
+async def test_subscribes_wait_for_the_executor(hass):
+    hub = ConnectionHub(BoundedExecutor(max_workers=1, max_queue=0))
+    connected_room = SimpleNamespace(metrics=MetricsRegistry())
+    hub.rooms.append(connected_room)
+    hub.pusher = hub._create_pusher()
+    connection = hub.pusher.connection
+    connection.state = "connected"
+    threads = threading.active_count()
+
+    sent = []
+
+    with patch.object(
+        connection, "send_event", lambda event, data: sent.append(data["channel"])
+    ):
+        # No thread of its own while the executor is full
+        hub.subscribe("channel-a", "key")
+
+        assert sent == []
+        assert threading.active_count() == threads
+        assert connected_room.metrics.counters["connection.subscribes_deferred"] == 1
+
+        # Sent from the executor once a message shows it has room again
+        hub.executor.max_queue = 1
+        connection._parse(json.dumps({"event": "pusher:pong", "data": {}}))
+        hub.executor.shutdown(wait=True)
+
+        assert sent == ["channel-a"]
+
+        # Or with all the channels on the next connection
+        hub.executor = BoundedExecutor(max_workers=1, max_queue=0)
+        hub.subscribe("channel-b", "key")
+        hub._on_connected({})
+        hub.executor.shutdown(wait=True)
+
+        assert sent == ["channel-a", "channel-a", "channel-b"]
+        assert hub._pending == {}